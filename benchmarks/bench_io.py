@@ -0,0 +1,76 @@
+"""
+Benchmark of the read-ahead / write-behind pipeline on slow storage.
+
+Converts the synthetic corpus serially with the inputs and notes read and written
+in turn (--io-depth 0) and with the pipeline (--io-depth 2), optionally adding a
+fixed latency to every file read and write to model networked storage. Every run
+starts from an empty output folder with --force, so all books are converted. Time
+is the best of --repeat runs.
+
+    python -m benchmarks.bench_io [--scale 2] [--latency 20] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from bible_processor import main as converter, parsers
+from bible_processor.writer import OutputWriter
+from benchmarks.corpus import generate_corpus
+
+
+@contextlib.contextmanager
+def slow_storage(latency: float):
+    """Add latency seconds to every input read and output write."""
+    read_html, write = parsers.read_html, OutputWriter.write
+
+    def slow_read(path):
+        time.sleep(latency)
+        return read_html(path)
+
+    def slow_write(self, path, content):
+        time.sleep(latency)
+        return write(self, path, content)
+
+    # main imports read_html by name, parsers uses its own
+    converter.read_html = parsers.read_html = slow_read
+    OutputWriter.write = slow_write
+    try:
+        yield
+    finally:
+        converter.read_html = parsers.read_html = read_html
+        OutputWriter.write = write
+
+
+def convert(corpus_dir: str, output_dir: str, io_depth: int) -> float:
+    """Seconds to convert the corpus from scratch."""
+    shutil.rmtree(output_dir, ignore_errors=True)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        converter.process_all_files(corpus_dir, output_dir, force=True, io_depth=io_depth)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time serial conversion with and without overlapped I/O.")
+    parser.add_argument("--scale", type=int, default=2, help="Book size multiplier of the synthetic corpus")
+    parser.add_argument("--latency", type=float, default=20, help="Milliseconds added to every file read and write")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir, output_dir = os.path.join(tmp, "in"), os.path.join(tmp, "out")
+        generate_corpus(corpus_dir, args.scale)
+        print(f"{'io_depth':>8s}{'latency ms':>12s}{'seconds':>10s}")
+        for latency in sorted({0.0, args.latency}):
+            for io_depth in (0, 2):
+                with slow_storage(latency / 1000):
+                    best = min(convert(corpus_dir, output_dir, io_depth) for _ in range(args.repeat))
+                print(f"{io_depth:8d}{latency:12.0f}{best:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
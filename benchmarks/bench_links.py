@@ -0,0 +1,68 @@
+"""
+Microbenchmark of the per-link cost of convert_to_obsidian_link.
+
+Compares the single-scan book abbreviation rewrite against the previous loop of one
+re.sub per Jubilee abbreviation, and times a full link conversion with and without
+the link conversion cache.
+
+    python -m benchmarks.bench_links [--number N]
+"""
+import argparse
+import re
+import timeit
+
+from bs4 import BeautifulSoup
+
+from bible_processor.constants import BOOK_ABBR, JUBILEE_ABRV_TO_FULL_BOOK
+from bible_processor import utils
+from bible_processor.utils import extract_link, link_cache_info, obsidian_link, replace_jubilee_abbreviations
+
+# Link texts as they occur in text, footnote and outline files
+SAMPLE_TEXTS = ["1", "a", "•", "Mat 5:3", "1Co 15:45; 2Co 3:17", "Gen 1:26 note 1", "see Rom 8:2 and Joh 1:14", "[par.]", "Psa 119"]
+SAMPLE_LINKS = [
+    '<a href="GenN.htm#n1_1x1a"><s>1</s>a</a>',
+    '<a href="Rom.htm#v8_2">Rom 8:2</a>',
+    '<a href="#v3">•</a>',
+    '<a href="a.htm">Mat</a>',
+    '<a href="MatO.htm#o12">I.</a>',
+]
+SAMPLE_REFS = {"Gen": {"1-1x1a": "1-1x1a"}}
+
+
+def legacy_replace_jubilee_abbreviations(text: str) -> str:
+    """The previous implementation: one regex scan per Jubilee abbreviation."""
+    for jubilee_abbr, full_book in JUBILEE_ABRV_TO_FULL_BOOK.items():
+        abbr = BOOK_ABBR.get(full_book, full_book)
+        text = re.sub(rf'\b{re.escape(jubilee_abbr)}\b', abbr, text)
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the per-link cost of link conversion.")
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per sample")
+    args = parser.parse_args()
+
+    for text in SAMPLE_TEXTS:
+        assert replace_jubilee_abbreviations(text) == legacy_replace_jubilee_abbreviations(text), text
+
+    links = [extract_link(BeautifulSoup(html, "html.parser").a) for html in SAMPLE_LINKS]
+    timings = {
+        "abbreviations, legacy loop": lambda: [legacy_replace_jubilee_abbreviations(t) for t in SAMPLE_TEXTS],
+        "abbreviations, single scan": lambda: [replace_jubilee_abbreviations(t) for t in SAMPLE_TEXTS],
+        "obsidian_link, uncached": lambda: [obsidian_link(*link, "Gen", SAMPLE_REFS) for link in links],
+        "obsidian_link, cached": lambda: [obsidian_link(*link, "Gen", SAMPLE_REFS) for link in links],
+    }
+    sizes = {"obsidian_link, uncached": len(links), "obsidian_link, cached": len(links)}
+    cached_plan = utils._link_plan
+    for name, func in timings.items():
+        # obsidian_link looks _link_plan up in the module, so the uncached run swaps in the plain function
+        utils._link_plan = cached_plan.__wrapped__ if name.endswith("uncached") else cached_plan
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        per_link = seconds / (args.number * sizes.get(name, len(SAMPLE_TEXTS)))
+        print(f"{name:30s} {per_link * 1e6:8.2f} µs/link")
+    utils._link_plan = cached_plan
+    print(f"link cache: {link_cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Per-book comparison of the html.parser and lxml backends (see parsers.set_parser_backend).
+
+Every book is extracted and rendered to its Text, Footnotes and Outlines notes with
+each backend, and the notes are compared line by line. A book is reported as
+"identical", or with the first line that differs; "fallback" means load_footnotes
+re-parsed its footnotes with html.parser. Time is the best of --repeat extractions
+(footnotes, text and outline), rendering is the same for both backends. Run it on
+the real Jubilee files before switching a vault to --parser lxml or auto:
+
+    python -m benchmarks.bench_parsers [INPUT_DIR] [--scale 5] [--repeat 3]
+
+Without INPUT_DIR the synthetic corpus (see corpus.py) is used.
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import tempfile
+import time
+
+from bible_processor.constants import BOOK_ABBR, JUBILEE_ABRV_TO_FULL_BOOK
+from bible_processor.parsers import extract_book, load_footnotes, set_parser_backend
+from bible_processor.render import render_obsidian
+from benchmarks.corpus import generate_corpus
+
+BACKENDS = ("html.parser", "lxml")
+
+
+def input_books(input_dir: str):
+    """Yield (book, text file, notes file, outline file) of the books in a folder of Jubilee files."""
+    for name in sorted(os.listdir(input_dir)):
+        if not name.endswith("N.htm"):
+            continue
+        base = name[:-len("N.htm")]
+        book = BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK.get(base))
+        text_file = os.path.join(input_dir, f"{base}.htm")
+        if book and os.path.exists(text_file):
+            yield book, text_file, os.path.join(input_dir, name), os.path.join(input_dir, f"{base}O.htm")
+
+def convert(backend: str, books: list, repeat: int) -> tuple:
+    """({book: rendered notes}, {book: best extraction seconds}, books whose footnotes fell back to html.parser)."""
+    set_parser_backend(backend)
+    all_refs, fallbacks = {}, set()
+    for book, _, notes_file, _ in books:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            all_refs[book] = load_footnotes(notes_file)[0]
+        if "using html.parser" in output.getvalue():
+            fallbacks.add(book)
+    rendered, timings = {}, {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for book, text_file, notes_file, outline_file in books:
+            best = math.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ir = extract_book(text_file, notes_file, outline_file, book)
+                best = min(best, time.perf_counter() - start)
+            timings[book] = best
+            rendered[book] = render_obsidian(ir, all_refs)
+    return rendered, timings, fallbacks
+
+def first_difference(expected: dict, actual: dict) -> str:
+    """"identical", or the note and line number of the first line that differs."""
+    for path, content in expected.items():
+        lines, other = content.split("\n"), actual.get(path, "").split("\n")
+        for number, (line, other_line) in enumerate(zip(lines, other), 1):
+            if line != other_line:
+                return f"{path}:{number}"
+        if len(lines) != len(other):
+            return f"{path}:{min(len(lines), len(other)) + 1}"
+    return "identical"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the output and speed of the html.parser and lxml backends per book.")
+    parser.add_argument("input_dir", nargs="?", help="Folder of Jubilee .htm files (default: a synthetic corpus)")
+    parser.add_argument("--scale", type=int, default=5, help="Book size multiplier of the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Extractions per book and backend, the best is reported")
+    args = parser.parse_args()
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        parser.exit(1, "lxml is not installed.\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = args.input_dir
+        if not input_dir:
+            input_dir = tmp
+            generate_corpus(tmp, args.scale)
+        books = list(input_books(input_dir))
+        results = {backend: convert(backend, books, args.repeat) for backend in BACKENDS}
+
+    reference, reference_times, _ = results["html.parser"]
+    rendered, times, fallbacks = results["lxml"]
+    print(f"{'book':8s}{'html.parser ms':>16s}{'lxml ms':>10s}{'speedup':>9s}  output")
+    for book, *_ in books:
+        output = first_difference(reference[book], rendered[book]) + (" (fallback)" if book in fallbacks else "")
+        print(f"{book:8s}{reference_times[book] * 1000:16.2f}{times[book] * 1000:10.2f}"
+              f"{reference_times[book] / times[book]:9.2f}  {output}")
+    total, total_lxml = sum(reference_times.values()), sum(times.values())
+    identical = sum(first_difference(reference[book], rendered[book]) == "identical" for book, *_ in books)
+    print(f"{'total':8s}{total * 1000:16.2f}{total_lxml * 1000:10.2f}{total / total_lxml:9.2f}  "
+          f"{identical} of {len(books)} books identical")
+
+
+if __name__ == "__main__":
+    main()
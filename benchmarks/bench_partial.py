@@ -0,0 +1,95 @@
+"""
+Benchmark of the targeted partial parses against building the full document.
+
+Outline: a full soup of the O.htm file searched for the outline tags, as
+extract_outline does, against a SoupStrainer parse that only builds the outline
+tags, after cutting the head/h3/pre blocks out of the HTML. The "same" column
+says whether both found the same outline tags. The strained parse did not make
+extract_outline faster, so extract_outline parses the whole file; it is kept
+here as the measurement behind that choice. Properties: the search of extract_properties
+in the (already built) text soup for the <table align="center">, against cutting
+the table out of the HTML and parsing it alone. The text soup is needed for the
+verses anyway and the search stops at the table near the top of the file, so
+extract_properties keeps searching the soup; the table-only parse is kept here as
+the measurement behind that choice. Time is the best of --repeat runs, memory
+the tracemalloc peak while parsing.
+
+    python -m benchmarks.bench_partial [--scale 10] [--repeat 5]
+"""
+import argparse
+import math
+import re
+import tempfile
+import time
+import tracemalloc
+
+from bible_processor.parsers import OUTLINE_TAGS, PARSER_BACKEND, make_soup
+from bs4 import BeautifulSoup, SoupStrainer
+from benchmarks.corpus import corpus_books, generate_corpus
+
+# Blocks cut from outline files before the strained parse (they do not nest)
+_OUTLINE_SKIPPED_BLOCKS_RE = re.compile(r'<(head|h3|pre)\b.*?</\1\s*>', re.S | re.I)
+_PROPERTIES_TABLE_RE = re.compile(r'<table\b[^>]*\balign="center"[^>]*>.*?</table>', re.S | re.I)
+
+
+def full_outline(html: str) -> list:
+    """The parse of extract_outline."""
+    soup = make_soup(html)
+    for tag in soup(['head', 'h3', 'pre']):
+        tag.decompose()
+    return soup.find_all(OUTLINE_TAGS)
+
+def strained_outline(html: str) -> list:
+    """Build only the outline tags."""
+    html = _OUTLINE_SKIPPED_BLOCKS_RE.sub("", html)
+    return BeautifulSoup(html, PARSER_BACKEND, parse_only=SoupStrainer(OUTLINE_TAGS)).find_all(OUTLINE_TAGS)
+
+def full_properties(soup):
+    """The search of extract_properties."""
+    return soup.find("table", {"align": "center"})
+
+def cut_properties(html: str):
+    """Parse only the properties table."""
+    table = _PROPERTIES_TABLE_RE.search(html)
+    return make_soup(table.group()).find("table") if table else None
+
+
+def measure(repeat: int, func, arg) -> tuple:
+    """Best time in seconds and tracemalloc peak in bytes of func(arg)."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and partial parses of outline and property extraction.")
+    parser.add_argument("--scale", type=int, default=10, help="Book size multiplier of the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the best is reported")
+    args = parser.parse_args()
+
+    pairs = {"outline": (full_outline, strained_outline, 2), "properties": (full_properties, cut_properties, 0)}
+    print(f"{'book':8s}{'':12s}{'full ms':>10s}{'partial ms':>12s}{'full KiB':>10s}{'partial KiB':>13s}{'same':>6s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_corpus(tmp, args.scale)
+        for book, *files in corpus_books(tmp):
+            for name, (full, partial, file_index) in pairs.items():
+                with open(files[file_index], 'r', encoding='utf-8') as f:
+                    html = f.read()
+                if file_index == 0:
+                    html = re.sub(r'\s+', ' ', html).strip()
+                full_time, full_peak = measure(args.repeat, full, make_soup(html) if full is full_properties else html)
+                partial_time, partial_peak = measure(args.repeat, partial, html)
+                same = str(full(make_soup(html) if full is full_properties else html)) == str(partial(html))
+                print(f"{book:8s}{name:12s}{full_time * 1000:10.2f}{partial_time * 1000:12.2f}"
+                      f"{full_peak / 1024:10.0f}{partial_peak / 1024:13.0f}{'yes' if same else 'no':>6s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark of the conversion pipeline on the synthetic corpus (see corpus.py).
+
+Times the footnote pre-pass, the three parsers, the extract_text and render_text
+halves of parse_text, the stages of render_text and an end-to-end
+process_all_files run at growing book sizes. The exponent column is
+the log-log slope of time over book size, so stages that grow super-linearly stand
+out with values well above 1.
+
+    python -m benchmarks.bench_pipeline [--scales 1,2,5,10,20] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import tempfile
+import time
+
+from bible_processor.main import process_all_files
+from bible_processor.parsers import extract_text, load_footnotes, parse_footnotes, parse_outline, parse_text
+from bible_processor.render import render_text
+from bible_processor import utils
+from benchmarks.corpus import corpus_books, generate_corpus
+
+
+def _line_stages(text: str, book: str) -> str:
+    """The line stages of render_text, chained as generators like render_text does."""
+    lines = utils.iter_remove_unwanted_lines_and_separate_verse_outline(text.splitlines(), book)
+    lines = utils.iter_map_outline_lines(utils.iter_lines(lines), book)
+    lines = utils.iter_outline_with_spacing(utils.iter_lines(lines), book)
+    lines = utils.iter_combine_split_verses(utils.iter_lines(lines))
+    lines = utils.iter_add_verse_anchors(utils.iter_lines(lines))
+    lines = utils.iter_combine_nav_and_verse_lines(utils.iter_lines(lines))
+    return "\n".join(lines)
+
+# The stages of render_text after the link placeholders are resolved, in pipeline order
+TEXT_STAGES = [
+    ("cleanup_markdown", lambda text, book: utils.cleanup_markdown(text, book)),
+    ("merge_multiline_chapter_links", lambda text, book: utils.merge_multiline_chapter_links(text)),
+    ("add_chapter_anchors", lambda text, book: utils.add_chapter_anchors(text, book)),
+    ("replace_bible_links", lambda text, book: utils.replace_bible_links(text, book)),
+    ("line_stages", _line_stages),
+    ("merge_top_chapters_line", lambda text, book: utils.merge_top_chapters_line(text)),
+    ("ensure_empty_line_before_dashes", lambda text, book: utils.ensure_empty_line_before_dashes(text)),
+]
+
+
+def _resolved_text(book_text, book: str, all_refs: dict) -> str:
+    """The text render_text hands to its first stage."""
+    text = utils.resolve_link_placeholders(book_text.text, book_text.links, book, all_refs)
+    return text.strip().replace("\xa0", " ")
+
+def _best_of(repeat: int, func) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_scale(scale: int, repeat: int) -> dict:
+    """Seconds per benchmark for the corpus at the given scale, summed over all books."""
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = os.path.join(tmp, "in")
+        generate_corpus(corpus_dir, scale)
+        books = list(corpus_books(corpus_dir))
+        all_refs = {book: load_footnotes(notes)[0] for book, _, notes, _ in books}
+
+        def add(name, func):
+            timings[name] = timings.get(name, 0.0) + _best_of(repeat, func)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            for book, text_file, notes_file, outline_file in books:
+                add("pre_process_footnotes", lambda: load_footnotes(notes_file))
+                add("parse_text", lambda: parse_text(text_file, book, all_refs))
+                add("parse_footnotes", lambda: parse_footnotes(notes_file, book, all_refs))
+                add("parse_outline", lambda: parse_outline(outline_file, book))
+                add("  extract_text", lambda: extract_text(text_file, book))
+                book_text = extract_text(text_file, book)
+                add("  render_text", lambda: render_text(book_text, book, all_refs))
+                text = _resolved_text(book_text, book, all_refs)
+                for name, stage in TEXT_STAGES:
+                    add(f"    {name}", lambda: stage(text, book))
+                    text = stage(text, book)
+            add("process_all_files", lambda: process_all_files(corpus_dir, os.path.join(tmp, "out"), force=True))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on a synthetic corpus at growing scales.")
+    parser.add_argument("--scales", default="1,2,5,10,20", help="Comma-separated book size multipliers")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best is reported")
+    args = parser.parse_args()
+    scales = [int(s) for s in args.scales.split(",")]
+
+    results = {scale: bench_scale(scale, args.repeat) for scale in scales}
+    names = list(results[scales[0]])
+    print(f"{'ms':34s}" + "".join(f"{f'{s}x':>10s}" for s in scales) + f"{'exponent':>10s}")
+    for name in names:
+        row = [results[s][name] for s in scales]
+        exponent = ""
+        if len(scales) > 1 and row[0] > 0:
+            exponent = f"{math.log(row[-1] / row[0]) / math.log(scales[-1] / scales[0]):10.2f}"
+        print(f"{name:34s}" + "".join(f"{t * 1000:10.1f}" for t in row) + exponent)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Synthetic Jubilee corpus generator.
+
+Writes X.htm / XN.htm / XO.htm triples with the structures the parsers rely on:
+navigation and chapter links, an <ins> property table, a subject line, chapter
+headings (Psalm headers for Psa), verse headers including split "a"/"b" verses and
+one-chapter books, <a name="n1_1x1a"> footnote anchors in front of <p> tags, and
+<kbd>/<em>/<h6> outline points. The content is filler; only the structure matters.
+
+    python -m benchmarks.corpus OUTPUT_DIR [--scale N]
+"""
+import argparse
+import os
+
+from bible_processor.constants import BOOK_ABBR, JUBILEE_ABRV_TO_FULL_BOOK
+
+# (Jubilee abbreviation, chapters, verses per chapter) at scale 1
+DEFAULT_BOOKS = [
+    ("Gen", 6, 5),
+    ("Exo", 3, 3),
+    ("Psa", 12, 3),
+    ("Mat", 4, 4),
+    ("Rom", 8, 4),
+    ("Jud", 1, 6),
+]
+ROMAN = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X"]
+OUTLINE_TAGS = ["kbd", "em", "h6"]
+
+
+def _verse_header(jub: str, chapter: int, verse: str, one_chapter: bool) -> str:
+    if one_chapter:
+        return f'<b><a href="a.htm">{jub}</a> <a href="#v1_{verse}">{verse}</a></b> '
+    return (f'<b><a href="a.htm">{jub}</a> <a href="#v{chapter}">{chapter}</a>:'
+            f'<a href="#v{chapter}_{verse.rstrip("ab")}">{verse}</a></b> ')
+
+def text_html(jub: str, chapters: int, verses: int) -> str:
+    """Text file of a book."""
+    full = JUBILEE_ABRV_TO_FULL_BOOK[jub]
+    one_chapter = chapters == 1
+    out = [f'<html><head><title>{full}</title></head><body>', '<a href="a.htm">Home</a>']
+    out.append(f'<p>Book | <a href="Gen.htm">Gen</a> <a href="Exo.htm">Exo</a> {jub} <a href="Rom.htm">Rom</a></p>')
+    out.append('<a href="#b">Chapters</a><br>')
+    out.append('<b>ch.</b> ' + ' '.join(f'<a href="#v{c}">{c}</a>' for c in range(1, chapters + 1)) + '<br>')
+    out.append('<table align="center">'
+               '<tr><td><ins>Author: Moses, see <a href="Exo.htm#v1_1">Exo 1:1</a></ins></td></tr>'
+               '<tr><td><ins>Time of Writing: About 1400 B.C. &amp; later</ins></td></tr>'
+               '<tr><td><ins>Recipient: Israel</ins></td></tr></table>')
+    out.append(f'<a href="#subject">Subject of {full}</a>:<br>God\'s <i>creation</i> of man<br>')
+    point = 1
+    for c in range(1, chapters + 1):
+        next_anchor = c + 1 if c < chapters else "b"
+        if jub == "Psa":
+            out.append(f'<a href="">Psalm</a> <a href="#v{next_anchor}">{c}</a><br>'
+                       f'<b>vv.</b> <a href="#v{c}_1">1</a>-<a href="#v{c}_2">2</a><br>')
+        elif not one_chapter:
+            out.append(f'<a href="#v{next_anchor}">Chapter {c} of {full}</a><br>')
+        if c % 2 == 1:
+            out.append(f'<a href="{jub}O.htm#o{point}">{ROMAN[(point - 1) % len(ROMAN)]}.</a> Outline point {point}<br>')
+            point += 1
+        for v in range(1, verses + 1):
+            out.append(_verse_header(jub, c, str(v), one_chapter)
+                       + f'In the beginning <a href="{jub}N.htm#n{c}_{v}x{v}a"><s>1</s>a</a> God created '
+                       f'<i>the</i> heavens and <a href="Rom.htm#v{c}_{v}">Rom {c}:{v}</a> and '
+                       f'<a href="RomN.htm#n1_1x1a">see</a> [note] &nbsp; earth.<br>')
+            if v == 2:
+                out.append(f'<a href="{jub}O.htm#o{point}">A.</a> Sub point {point}<br>')
+                point += 1
+            if v == 3:
+                out.append('<q>a quoted poem line</q><br>')
+            if v == 4 and not one_chapter:
+                split = verses + 1
+                out.append(_verse_header(jub, c, f"{split}a", one_chapter) + f'<a href="{jub}O.htm#o99">-</a> first half.<br>')
+                out.append(f'<br><a href="{jub}O.htm#o{point}">B.</a> Split point<br><br>')
+                point += 1
+                out.append(_verse_header(jub, c, f"{split}b", one_chapter) + f'<a href="{jub}O.htm#o98">-</a> second half.<br>')
+    out.append('</body></html>')
+    return '\n'.join(out)
+
+def notes_html(jub: str, chapters: int, verses: int) -> str:
+    """Footnotes file of a book, one note per verse."""
+    out = ['<html><head><title>Notes</title></head><body><h3>Footnotes</h3><pre>x</pre>']
+    for c in range(1, chapters + 1):
+        for v in range(1, verses + 1):
+            out.append(
+                f'<a name="n{c}_{v}x{v}"></a><a name="n{c}_{v}x{v}a"></a><p><b>{c}:{v}<sup>1</sup></b> '
+                f'Note text for <a href="{jub}.htm#v{c}_{v}">{c}:{v}</a>, cf. <a href="Rom.htm#v8_2">Rom 8:2</a>; '
+                f'<u>under</u> <s>strike</s> and <a href="RomN.htm#n1_1x1a">Rom 1:1 note 1</a>.<br>  second line<br>'
+                f'[ <b>par.</b> <a href="{jub}N.htm#n{c}_{v}x{v}a">1</a> ]</p>')
+    out.append('</body></html>')
+    return '\n'.join(out)
+
+def outline_html(jub: str, chapters: int, verses: int) -> str:
+    """Outline file of a book."""
+    out = ['<html><head><title>Outline</title></head><body><h3>Outline</h3>']
+    point = 1
+    for c in range(1, chapters + 1):
+        if c % 2 == 1:
+            out.append(f'<kbd><a name="o{point}"></a><a href="{jub}.htm#o{point}">{ROMAN[(point - 1) % len(ROMAN)]}.</a> '
+                       f'<u class="o">Point {point}</u> &mdash; <a href="{jub}.htm#v{c}_1">{c}:1</a>-'
+                       f'<a href="{jub}.htm#v{c}_{verses}">{verses}</a></kbd>')
+            point += 1
+        tag = OUTLINE_TAGS[1 + c % 2]
+        out.append(f'<{tag}><a name="o{point}"></a><a href="{jub}.htm#o{point}">A.</a> <u class="o">Sub {point}</u> '
+                   f'&mdash; <a href="{jub}.htm#v{c}_2">{c}:2</a>, <a href="{jub}.htm#v{c}_3">3</a></{tag}>')
+        point += 1
+    out.append('</body></html>')
+    return '\n'.join(out)
+
+def generate_corpus(output_dir: str, scale: int = 1, books: list = None) -> list:
+    """Write the corpus with every book's chapter count multiplied by scale; returns the written files."""
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for jub, chapters, verses in books or DEFAULT_BOOKS:
+        chapters = chapters if chapters == 1 else chapters * scale
+        verses = verses * scale if chapters == 1 else verses
+        for suffix, render in (("", text_html), ("N", notes_html), ("O", outline_html)):
+            path = os.path.join(output_dir, f"{jub}{suffix}.htm")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(render(jub, chapters, verses))
+            written.append(path)
+    return written
+
+def corpus_books(corpus_dir: str, books: list = None):
+    """Yield (book, text file, notes file, outline file) of a corpus written by generate_corpus."""
+    for jub, _, _ in books or DEFAULT_BOOKS:
+        book = BOOK_ABBR[JUBILEE_ABRV_TO_FULL_BOOK[jub]]
+        yield book, *(os.path.join(corpus_dir, f"{jub}{suffix}.htm") for suffix in ("", "N", "O"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Jubilee corpus.")
+    parser.add_argument("output_dir", help="Directory to write the HTML files to")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the size of every book")
+    args = parser.parse_args()
+    files = generate_corpus(args.output_dir, args.scale)
+    print(f"Wrote {len(files)} files to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
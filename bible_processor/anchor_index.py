@@ -0,0 +1,165 @@
+"""
+On-disk index of every book's footnote anchor mapping, so that a run only scans the
+N.htm files that changed since the last run instead of all of them, and
+FootnoteAnchors, which loads a book's mapping only when a link first resolves into it.
+
+Entries are keyed by the footnote file's size and mtime, with its content hash as
+the fallback when only the mtime changed. Each mapping is stored grouped by target
+anchor ({last anchor: [anchors]}), which stores every anchor only once.
+"""
+import json
+import os
+from collections.abc import Mapping
+
+from . import inputs
+from .manifest import file_hash, pipeline_version, refs_hash
+from .parsers import load_footnotes
+
+ANCHOR_INDEX_FILE = os.path.join(".bible_processor", "anchors.json")
+
+
+def _pack(refs: dict) -> dict:
+    packed = {}
+    for anchor, target in refs.items():
+        packed.setdefault(target, []).append(anchor)
+    return packed
+
+def _unpack(packed: dict) -> dict:
+    return {anchor: target for target, anchors in packed.items() for anchor in anchors}
+
+
+def load_anchor_index(output_dir: str, options: dict = None) -> dict:
+    """Load the index of a previous run, or an empty one if it was written by other code or another parser backend."""
+    path = os.path.join(output_dir, ANCHOR_INDEX_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {"version": None, "books": {}}
+    if index.get("version") != pipeline_version() or index.get("options", {}) != (options or {}):
+        return {"version": None, "books": {}}
+    return index
+
+def save_anchor_index(output_dir: str, index: dict, options: dict = None):
+    """Write the index for the current pipeline version and parser backend options."""
+    path = os.path.join(output_dir, ANCHOR_INDEX_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    index.pop("changed", None)
+    index["version"] = pipeline_version()
+    index["options"] = options or {}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"), sort_keys=True)
+
+def cached_refs(index: dict, book: str, note_file: str):
+    """
+    Return the book's anchor mapping from the index if note_file is unchanged, else None.
+
+    A file whose mtime changed but whose content did not gets its entry refreshed.
+    """
+    entry = index["books"].get(book)
+    if not entry or entry.get("file") != os.path.basename(note_file):
+        return None
+    size, mtime_ns = inputs.stat(note_file)
+    if (entry["size"], entry["mtime_ns"]) != (size, mtime_ns):
+        if entry["size"] != size or entry["sha256"] != file_hash(note_file):
+            return None
+        entry["mtime_ns"] = mtime_ns
+        index["changed"] = True
+    return _unpack(entry["refs"])
+
+def update_refs(index: dict, book: str, note_file: str, refs: dict):
+    """Store a freshly scanned anchor mapping of the book in the index."""
+    size, mtime_ns = inputs.stat(note_file)
+    index["books"][book] = {
+        "file": os.path.basename(note_file),
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "sha256": file_hash(note_file),
+        "refs": _pack(refs),
+    }
+    index["changed"] = True
+
+
+class FootnoteAnchors(Mapping):
+    """
+    all_refs mapping that loads a book's footnote anchors on first access, from the
+    index if the footnotes file is unchanged and by scanning it otherwise.
+
+    note_files maps every book to its footnotes file; books without one are missing
+    keys. The notes of scanned files are kept until notes() hands them out.
+    """
+
+    def __init__(self, note_files: dict, index: dict):
+        self._files = note_files
+        self._index = index
+        self._refs = {}
+        self._notes = {}
+        self.scanned = set()
+
+    def __getitem__(self, book):
+        if book not in self._refs:
+            note_file = self._files[book]
+            refs = cached_refs(self._index, book, note_file)
+            if refs is None:
+                refs, notes = load_footnotes(note_file)
+                self.add(book, refs, notes)
+            else:
+                self._refs[book] = refs
+        return self._refs[book]
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def __getstate__(self):
+        # Parsed notes are only needed by the book they belong to, see notes()
+        return {**self.__dict__, "_notes": {}}
+
+    def is_stale(self, book: str) -> bool:
+        """True if the book's anchors are not loaded yet and its footnotes file changed since it was indexed."""
+        return book not in self._refs and cached_refs(self._index, book, self._files[book]) is None
+
+    def add(self, book: str, refs: dict, notes: list):
+        """Store the result of load_footnotes for the book's footnotes file."""
+        self._refs[book] = refs
+        self._notes[book] = notes
+        self.scanned.add(book)
+        update_refs(self._index, book, self._files[book], refs)
+
+    def notes(self, book: str):
+        """The book's notes if its footnotes file was scanned, else the file itself (see main._convert_book)."""
+        return self._notes.pop(book, self._files[book])
+
+    def refresh(self, note_files: dict):
+        """Switch to a new set of footnotes files, dropping loaded anchors whose file changed or disappeared."""
+        self._files = note_files
+        self.scanned = set()
+        for book in list(self._refs):
+            if book not in note_files or cached_refs(self._index, book, note_files[book]) is None:
+                del self._refs[book]
+                self._notes.pop(book, None)
+
+    def loaded(self) -> list:
+        """The books whose anchors have been loaded so far."""
+        return list(self._refs)
+
+
+class RefsHashes(Mapping):
+    """Hashes of the anchor mappings of a FootnoteAnchors, computed on first access."""
+
+    def __init__(self, all_refs: Mapping):
+        self._all_refs = all_refs
+        self._hashes = {}
+
+    def __getitem__(self, book):
+        if book not in self._hashes:
+            self._hashes[book] = refs_hash(self._all_refs[book])
+        return self._hashes[book]
+
+    def __iter__(self):
+        return iter(self._all_refs)
+
+    def __len__(self):
+        return len(self._all_refs)
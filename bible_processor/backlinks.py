@@ -0,0 +1,122 @@
+"""
+Backlink graph of the verses, footnotes and outline points.
+
+Every converted book records its outgoing links in .bible_processor/links/<book>.json:
+for each link of its notes from a block (a verse, footnote or outline point) to the
+block of a book note, the source as Note#^block and the target note and block ID.
+The links are recorded as rendering resolves them (see render.render_obsidian), not
+parsed back from the notes. After a run, the link files of all books are inverted
+into one file per target book in .bible_processor/backlinks/, mapping each of its
+notes' block IDs to the blocks that link to it; the file of a book nothing links to
+any more is removed:
+
+    {"Rom": {"8-2": ["GenN#^1-1x1a", "Matt#^5-3"]}, "RomN": {...}, "RomO": {...}}
+
+A block's links to itself (footnote paragraph links; verse headers are not
+searched for links), the links
+between a verse and its own footnotes, and links to chapters or to notes that are
+not generated are left out.
+"""
+import json
+import os
+import re
+
+from .blocks import book_order, note_book
+from .constants import BOOK_ABBR_INDEX, ONE_CHAPTER_BOOKS
+from .writer import OutputWriter
+
+LINKS_DIR = os.path.join(".bible_processor", "links")
+BACKLINKS_DIR = os.path.join(".bible_processor", "backlinks")
+
+# Block IDs of verses (3-16, 1-Title), footnotes (3-16x1a, Titlex1) and outline points (o12)
+_TARGET_ID_RE = re.compile(r'\d+-(?:\d+|Title)|(?:\d+-)?(?:\d+|Title)x\w+|o\d+')
+# Block IDs of the verses of one-chapter books (5), which are chapter anchors in other books
+_ONE_CHAPTER_VERSE_ID_RE = re.compile(r'\d+|Title')
+
+
+def _footnote_prefixes(book: str, verse: str) -> tuple:
+    """The prefixes of the footnote block IDs of a verse block ID (3-16x); in one-chapter books 5x and 1-5x alike."""
+    if book in ONE_CHAPTER_BOOKS:
+        verse = verse.removeprefix("1-")
+        return f"{verse}x", f"1-{verse}x"
+    return (f"{verse}x",)
+
+def _own_footnote(note: str, block: str, target: str, anchor: str) -> bool:
+    """Whether the link is between a verse and one of its own footnotes (the note marker and the note's verse reference)."""
+    book = note_book(note)
+    if note_book(target) != book:
+        return False
+    if note == book and target == f"{book}N":
+        return anchor.startswith(_footnote_prefixes(book, block))
+    return note == f"{book}N" and target == book and block.startswith(_footnote_prefixes(book, anchor))
+
+def _is_target(target: str, anchor: str) -> bool:
+    """Whether target#^anchor is a verse, footnote or outline point of a book note."""
+    if anchor is None or note_book(target) not in BOOK_ABBR_INDEX:
+        return False
+    return bool(_TARGET_ID_RE.fullmatch(anchor) or (target in ONE_CHAPTER_BOOKS and _ONE_CHAPTER_VERSE_ID_RE.fullmatch(anchor)))
+
+def book_links(links) -> list:
+    """
+    The sorted [source, target note, target block ID] links of a book from the
+    (note, block ID, target note, target block ID) links recorded while rendering it
+    (see render.render_obsidian), without the links the module docstring leaves out.
+    """
+    edges = {
+        (f"{note}#^{block}", target, anchor)
+        for note, block, target, anchor in links
+        if _is_target(target, anchor) and (target, anchor) != (note, block) and not _own_footnote(note, block, target, anchor)
+    }
+    return sorted(list(edge) for edge in edges)
+
+def links_path(output_dir: str, book: str) -> str:
+    return os.path.join(output_dir, LINKS_DIR, f"{book}.json")
+
+def save_book_links(output_dir: str, book: str, links: list):
+    """Record the outgoing [source, target note, target block ID] links of a book (see book_links)."""
+    OutputWriter(output_dir).write(links_path(output_dir, book), json.dumps(links, separators=(",", ":")))
+
+
+def _source_key(source: str) -> tuple:
+    """Sort key putting sources in Bible order, then in note and verse order (Psa#^2-1 before Psa#^10-1)."""
+    note, _, block = source.partition("#^")
+    return book_order(note_book(note)), note, [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', block)]
+
+def backlinks(output_dir: str) -> dict:
+    """{target book: {target note: {block ID: [sources]}}} from the link files of all books."""
+    directory = os.path.join(output_dir, LINKS_DIR)
+    graph = {}
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            for source, target, anchor in json.load(f):
+                graph.setdefault(note_book(target), {}).setdefault(target, {}).setdefault(anchor, []).append(source)
+    return graph
+
+def save_backlinks(output_dir: str) -> OutputWriter:
+    """
+    Rebuild the backlink files of all books; only the files whose content changed are
+    rewritten, and those of books nothing links to any more are removed.
+    """
+    writer = OutputWriter(output_dir)
+    graph = backlinks(output_dir)
+    for book, notes in graph.items():
+        content = {note: {anchor: sorted(sources, key=_source_key) for anchor, sources in sorted(anchors.items())} for note, anchors in sorted(notes.items())}
+        writer.write(backlinks_path(output_dir, book), json.dumps(content, separators=(",", ":")))
+    directory = os.path.join(output_dir, BACKLINKS_DIR)
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        if name.endswith(".json") and name[:-len(".json")] not in graph:
+            os.remove(os.path.join(directory, name))
+    return writer
+
+def backlinks_path(output_dir: str, book: str) -> str:
+    return os.path.join(output_dir, BACKLINKS_DIR, f"{book}.json")
+
+def load_backlinks(output_dir: str, book: str) -> dict:
+    """{note: {block ID: [sources]}} of a book's notes, or {} if nothing links to it."""
+    try:
+        with open(backlinks_path(output_dir, book), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
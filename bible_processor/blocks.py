@@ -0,0 +1,107 @@
+"""
+Parsing of the generated markdown notes: paragraphs, their block IDs and wikilinks.
+
+A block ID is the "^id" at the end of a line (^1-1, ^o12, ^1-1x1a, ^b), usually the
+last line of its paragraph; Obsidian links to it as [[Note#^id|text]].
+"""
+import os
+import re
+
+from .constants import BOOK_ABBR_INDEX
+
+# [[note#anchor|text]], where note, #anchor and |text are each optional
+WIKILINK_RE = re.compile(r'\[\[([^\]|#]*)(?:#([^\]|]*))?(?:\|((?:\\\]|[^\]])*))?\]\]')
+# A block ID at the end of a line
+BLOCK_ID_RE = re.compile(r'(?:^|\s)\^([A-Za-z0-9-]+)[ \t]*$')
+# A markdown heading
+HEADING_RE = re.compile(r'^#{1,6}\s+(.*?)\s*$')
+
+
+def note_name(path: str) -> str:
+    """The name Obsidian links a note by: its file name without .md."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def note_book(note: str) -> str:
+    """The book of a generated note (Gen for Gen, GenN and GenO), or the note name for other notes."""
+    for suffix in ("N", "O"):
+        if note.endswith(suffix) and note[:-len(suffix)] in BOOK_ABBR_INDEX:
+            return note[:-len(suffix)]
+    return note
+
+def book_order(book: str) -> tuple:
+    """Sort key putting books in Bible order and other notes after them."""
+    return (BOOK_ABBR_INDEX.get(book, len(BOOK_ABBR_INDEX) + 1), book)
+
+def block_id(line: str):
+    """The block ID at the end of a line, or None."""
+    match = BLOCK_ID_RE.search(line)
+    return match.group(1) if match else None
+
+def _paragraph_block(lines: list):
+    for line in reversed(lines):
+        block = block_id(line)
+        if block:
+            return block
+    return None
+
+def iter_paragraphs(text: str):
+    """
+    Yield (first line number, lines, block ID or None) for every paragraph of a note.
+
+    Paragraphs are separated by empty lines and line numbers start at 1. The block ID
+    is the last one in the paragraph.
+    """
+    lines, start = [], 0
+    for number, line in enumerate(text.split("\n"), 1):
+        if line.strip():
+            if not lines:
+                start = number
+            lines.append(line)
+            continue
+        if lines:
+            yield start, lines, _paragraph_block(lines)
+            lines = []
+    if lines:
+        yield start, lines, _paragraph_block(lines)
+
+def block_spans(text: str, line_separator: str = "\n") -> dict:
+    """
+    Map every block ID of a note to the (byte offset, byte length) of its block in the
+    UTF-8 file written with line_separator: the lines from the start of its paragraph,
+    or from the line after the previous block ID in it, through the line of the ID.
+    The first occurrence of a duplicate ID wins.
+    """
+    spans, offset, start = {}, 0, None
+    separator_size = len(line_separator.encode("utf-8"))
+    for line in text.split("\n"):
+        end = offset + len(line.encode("utf-8"))
+        if not line.strip():
+            start = None
+        else:
+            if start is None:
+                start = offset
+            block = block_id(line)
+            if block:
+                spans.setdefault(block, (start, end - start))
+                start = None
+        offset = end + separator_size
+    return spans
+
+def iter_links(line: str):
+    """Yield (note, anchor, text) for every wikilink of a line; anchor keeps a leading ^ for block links."""
+    for match in WIKILINK_RE.finditer(line):
+        note, anchor, text = match.groups()
+        yield note.strip(), anchor or "", text
+
+def read_note(path: str) -> str:
+    """Content of a note."""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def iter_notes(vault_dir: str, exclude: tuple = ()):
+    """Yield the paths of all .md notes below vault_dir, skipping hidden folders and the exclude folders."""
+    for root, dirs, files in os.walk(vault_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and os.path.join(root, d) not in exclude)
+        for name in sorted(files):
+            if name.endswith(".md"):
+                yield os.path.join(root, name)
@@ -0,0 +1,78 @@
+"""
+Zip bundle output: the notes are streamed into one zip archive as the books finish,
+instead of being written to the output folder.
+
+The bundle is byte-identical for identical inputs: members are written in a fixed
+order (files added up front, then the books in the order given, each book's notes
+in render order), with a fixed timestamp, permissions and compression level, and
+"\n" line endings on every platform. Books that finish early, e.g. with --jobs, are
+held back until the books before them are written.
+"""
+import os
+import tempfile
+import zipfile
+
+# Timestamp of every member (the earliest a zip can store), so bundles do not depend on the time they were built
+BUNDLE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+BUNDLE_COMPRESSION_LEVEL = 6
+
+
+class ZipBundle:
+    """Zip archive at path that receives the notes of books, written in the order of books."""
+
+    def __init__(self, path: str, books: list):
+        self.path = path
+        self._order = list(books)
+        self._next = 0
+        self._pending = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        os.close(fd)
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=BUNDLE_COMPRESSION_LEVEL)
+        self.members = 0
+
+    def add_file(self, name: str, data: bytes):
+        """Write a member right away."""
+        info = zipfile.ZipInfo(name, BUNDLE_DATE_TIME)
+        info.create_system = 3
+        info.external_attr = 0o644 << 16
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self._zip.writestr(info, data, compresslevel=BUNDLE_COMPRESSION_LEVEL)
+        self.members += 1
+
+    def add_book(self, book: str, files: dict):
+        """Queue the {relative path: content} notes of a book; written once the books before it are."""
+        self._pending[book] = files
+        while self._next < len(self._order) and self._order[self._next] in self._pending:
+            for name, content in self._pending.pop(self._order[self._next]).items():
+                self.add_file(name, content.encode("utf-8"))
+            self._next += 1
+
+    def close(self):
+        """Finish the archive and move it to path; fails if a book of the order was never added."""
+        missing = self._order[self._next:]
+        if missing:
+            self.discard()
+            raise RuntimeError(f"Bundle {self.path} is missing books: {', '.join(missing)}")
+        self._zip.close()
+        # mkstemp creates the file readable by its owner only
+        os.chmod(self._tmp_path, 0o644)
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        """Drop the unfinished archive, leaving an existing bundle at path as it was."""
+        self._zip.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def summary(self) -> str:
+        return f"Wrote {self.members} files to {self.path}."
@@ -215,13 +215,14 @@ BOOK_ABBR_INDEX = {
     "Rev": 66,
 }
 
-# ONE_CHAPTER_BOOKS = {
-#   "Obad",
-#   "Philem",
-#   "2 John",
-#   "3 John",
-#   "Jude",
-# }
+# Books of one chapter, whose verse headers only give the verse, so their verses are block ^5 instead of ^1-5
+ONE_CHAPTER_BOOKS = {
+  "Obad",
+  "Philem",
+  "2 John",
+  "3 John",
+  "Jude",
+}
 
 BOOK_ABBR_REVERSE = {v: (k if k != "SS" else "Song of Songs") for k, v in BOOK_ABBR.items()}
 JUBILEE_ABRV_TO_FULL_BOOK_REVERSE = {v: k for k, v in JUBILEE_ABRV_TO_FULL_BOOK.items()}
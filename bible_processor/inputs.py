@@ -0,0 +1,190 @@
+"""
+Input layer: the Jubilee HTML files are read from a folder or, without extracting
+it, from a .zip or .tar(.gz/.bz2/.xz) archive.
+
+Input files are addressed by path either way; the files of an archive are
+<archive>/<file name>, e.g. Jubilee.zip/GenN.htm, whichever folder of the archive
+they are in. A zip archive is listed from its central directory and its members are
+decompressed one at a time when read. A tar archive has no central directory: an
+uncompressed one is indexed once and read by offset, a compressed one is streamed
+once and its HTML members are written to a temporary file and read by offset.
+
+An archive is opened and indexed once, by the main process when it lists the
+inputs, and forked pool workers read it through the inherited index. Reads use
+os.pread where it exists, which does not move the offset the processes share.
+"""
+import io
+import os
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+INPUT_SUFFIX = ".htm"
+
+
+def is_archive(path: str) -> bool:
+    """True if path is an archive file the inputs can be read from."""
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+class _PreadFile(io.RawIOBase):
+    """A read-only file with its own position, read with os.pread."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._fd = os.open(path, os.O_RDONLY)
+        self._size = os.fstat(self._fd).st_size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._size}[whence]
+        self._pos = base + offset
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        data = os.pread(self._fd, len(buffer), self._pos)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
+
+
+def _read_at(file, lock: threading.Lock, offset: int, size: int) -> bytes:
+    """size bytes of file at offset."""
+    if hasattr(os, "pread"):
+        return os.pread(file.fileno(), size, offset)
+    with lock:
+        file.seek(offset)
+        return file.read(size)
+
+
+class _ZipArchive:
+    """The .htm members of a zip file, read from its central directory."""
+
+    def __init__(self, path: str):
+        # A forked worker has its own copy of the position of a _PreadFile, but shares the offset of an open() file
+        self._zip = zipfile.ZipFile(_PreadFile(path) if hasattr(os, "pread") else path)
+        self.members = {}
+        for info in self._zip.infolist():
+            name = os.path.basename(info.filename)
+            if name.endswith(INPUT_SUFFIX) and not info.is_dir() and name not in self.members:
+                mtime_ns = int(time.mktime(info.date_time + (0, 0, -1))) * 10**9
+                self.members[name] = (info, info.file_size, mtime_ns)
+
+    def read(self, name: str) -> bytes:
+        return self._zip.read(self.members[name][0])
+
+
+class _TarArchive:
+    """The .htm members of a tar file."""
+
+    def __init__(self, path: str):
+        self.members = {}
+        self._offsets = {}
+        self._lock = threading.Lock()
+        if path.lower().endswith(".tar"):
+            with tarfile.open(path, "r:") as tar:
+                for info in tar:
+                    if self._add(info):
+                        self._offsets[os.path.basename(info.name)] = info.offset_data
+            self._file = open(path, "rb")
+        else:
+            # Seeking back in a compressed stream decompresses it again from the start
+            self._file = tempfile.TemporaryFile()
+            with tarfile.open(path, "r|*") as tar:
+                for info in tar:
+                    if self._add(info):
+                        self._offsets[os.path.basename(info.name)] = self._file.tell()
+                        self._file.write(tar.extractfile(info).read())
+            self._file.flush()
+
+    def _add(self, info: tarfile.TarInfo) -> bool:
+        name = os.path.basename(info.name)
+        if not (info.isfile() and name.endswith(INPUT_SUFFIX)) or name in self.members:
+            return False
+        self.members[name] = (info, info.size, int(info.mtime) * 10**9)
+        return True
+
+    def read(self, name: str) -> bytes:
+        return _read_at(self._file, self._lock, self._offsets[name], self.members[name][1])
+
+
+# Open archives by path, with the archive's size and mtime
+_ARCHIVES = {}
+_ARCHIVES_LOCK = threading.Lock()
+
+def _archive(path: str):
+    """The opened archive at path, reopened if it changed."""
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _ARCHIVES_LOCK:
+        cached = _ARCHIVES.get(path)
+        if cached is None or cached[0] != key:
+            archive = _ZipArchive(path) if path.lower().endswith(".zip") else _TarArchive(path)
+            cached = _ARCHIVES[path] = (key, archive)
+        return cached[1]
+
+def _member(path: str):
+    """The archive and member name of an input path inside an archive, or (None, None)."""
+    folder = os.path.dirname(path)
+    if is_archive(folder):
+        return _archive(folder), os.path.basename(path)
+    return None, None
+
+
+def listdir(folder: str) -> list:
+    """The file names in an input folder or archive."""
+    if is_archive(folder):
+        return sorted(_archive(folder).members)
+    return os.listdir(folder)
+
+def exists(path: str) -> bool:
+    archive, name = _member(path)
+    return name in archive.members if archive else os.path.exists(path)
+
+def stat(path: str) -> tuple:
+    """The (size, mtime_ns) of an input file."""
+    archive, name = _member(path)
+    if archive:
+        if name not in archive.members:
+            raise FileNotFoundError(path)
+        return archive.members[name][1:]
+    result = os.stat(path)
+    return result.st_size, result.st_mtime_ns
+
+def getsize(path: str) -> int:
+    return stat(path)[0]
+
+def read_bytes(path: str) -> bytes:
+    """The content of an input file."""
+    archive, name = _member(path)
+    if archive:
+        if name not in archive.members:
+            raise FileNotFoundError(path)
+        return archive.read(name)
+    with open(path, "rb") as f:
+        return f.read()
+
+def read_text(path: str) -> str:
+    """The content of a UTF-8 input file, with universal newlines like open() in text mode."""
+    archive, _ = _member(path)
+    if not archive:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return read_bytes(path).decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
@@ -0,0 +1,173 @@
+"""
+Intermediate representation between HTML extraction (parsers.py) and rendering
+(render.py), and its on-disk cache.
+
+The records hold everything rendering needs, so a book can be re-rendered, to any
+target, without BeautifulSoup. Links are kept as (href, name, text) entries behind
+LINK_PLACEHOLDER markers and only resolved at render time, because resolving them
+needs the footnote anchors of other books.
+
+The cache is JSON in .bible_processor/ir/<book>.json: the vault may be synced or
+shared, so nothing in it is loaded as code.
+"""
+import hashlib
+import json
+import os
+import re
+
+IR_CACHE_DIR = os.path.join(".bible_processor", "ir")
+# The modules whose code runs during extraction; a change to any of them invalidates
+# the cache. Rendering (render.py) is left out, so render changes do not re-parse.
+EXTRACTION_SOURCES = ("parsers.py", "ir.py", "utils.py", "constants.py")
+
+# The letter of the halves of a split verse (5a, 5b)
+_SPLIT_VERSE_RE = re.compile(r'(\d+)[ab]')
+
+
+class _Record:
+    """Record with fixed fields; iterates over its fields, so it can be unpacked like a tuple."""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values, strict=True):
+            setattr(self, field, value)
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self.__slots__)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__)})"
+
+
+class Footnote(_Record):
+    """A footnote paragraph: its block anchor, text with link placeholders and links."""
+    __slots__ = ("anchor", "text", "links")
+
+
+class OutlinePoint(_Record):
+    """
+    An outline point: its <a name> anchor (o12), label (I., A., 1.), main text and the
+    verse range it covers as markdown links. Outline links do not depend on other
+    books, so they are stored resolved. The heading level follows from the labels of
+    the points before it and is worked out at render time (see render.outline_levels).
+    """
+    __slots__ = ("anchor", "label", "text", "verses")
+
+
+class Verse(_Record):
+    """
+    A verse: the chapter and verse (5, 5a for the halves of a split verse) its header
+    names, the header (the bold reference in front of the verse) and the text of the
+    verse's line, both with link placeholders. The chapter is None in one-chapter
+    books, whose headers only give the verse.
+    """
+    __slots__ = ("chapter", "verse", "header", "text")
+
+    @property
+    def block(self) -> str:
+        """The block ID of the verse in the Text note (5-2, or 2 in one-chapter books; split verses share one)."""
+        match = _SPLIT_VERSE_RE.fullmatch(self.verse)
+        verse = match.group(1) if match else self.verse
+        return f"{self.chapter}-{verse}" if self.chapter else verse
+
+
+class Passage(_Record):
+    """
+    Text of a book outside its verses, with link placeholders: the book header before
+    the first verse, and the chapter headings, outline points and poem lines between
+    verses.
+    """
+    __slots__ = ("text",)
+
+
+class BookText(_Record):
+    """
+    The text file of a book: its Verses and Passages in order, the links their
+    placeholders refer to, and the (key, value) pairs of the property table (None if
+    the book has none), whose values are HTML with link placeholders.
+    """
+    __slots__ = ("blocks", "links", "properties")
+
+    @property
+    def text(self) -> str:
+        """The text of the whole file as extracted from the soup, with link placeholders."""
+        return "".join(block.header + block.text if isinstance(block, Verse) else block.text for block in self.blocks)
+
+    def verses(self):
+        """The Verse records."""
+        return (block for block in self.blocks if isinstance(block, Verse))
+
+
+class BookIR(_Record):
+    """Everything extracted from the three HTML files of a book."""
+    __slots__ = ("book", "text", "footnotes", "outline")
+
+
+# Record types of the blocks of a BookText, by the name they are stored under
+_BLOCK_TYPES = {"verse": Verse, "passage": Passage}
+
+def ir_to_json(ir: BookIR) -> dict:
+    """The JSON form of a BookIR: every record as the list of its fields."""
+    return {
+        "book": ir.book,
+        "text": {
+            "blocks": [["verse" if isinstance(block, Verse) else "passage", *block] for block in ir.text.blocks],
+            "links": ir.text.links,
+            "properties": ir.text.properties,
+        },
+        "footnotes": [list(note) for note in ir.footnotes],
+        "outline": [list(point) for point in ir.outline],
+    }
+
+def ir_from_json(data: dict) -> BookIR:
+    """The BookIR of its JSON form (see ir_to_json)."""
+    text = data["text"]
+    return BookIR(
+        data["book"],
+        BookText(
+            [_BLOCK_TYPES[kind](*values) for kind, *values in text["blocks"]],
+            [tuple(link) for link in text["links"]],
+            [tuple(pair) for pair in text["properties"]] if text["properties"] is not None else None,
+        ),
+        [Footnote(anchor, note_text, [tuple(link) for link in links]) for anchor, note_text, links in data["footnotes"]],
+        [OutlinePoint(*values) for values in data["outline"]],
+    )
+
+
+def ir_cache_key(input_hashes: dict, parser_backend: str) -> str:
+    """Key of a cached IR: the book's input hashes, the parser backend and the extraction code."""
+    digest = hashlib.sha256(parser_backend.encode("utf-8"))
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in EXTRACTION_SOURCES:
+        digest.update(f"\0{name}\0".encode("utf-8"))
+        with open(os.path.join(package_dir, name), "rb") as f:
+            digest.update(f.read())
+    for name, file_hash in sorted(input_hashes.items()):
+        digest.update(f"\0{name}\0{file_hash}".encode("utf-8"))
+    return digest.hexdigest()
+
+def ir_cache_path(output_dir: str, book: str) -> str:
+    """Where the IR of a book is cached."""
+    return os.path.join(output_dir, IR_CACHE_DIR, f"{book}.json")
+
+def load_ir(path: str, key: str):
+    """The cached BookIR at path if it was stored under key, else None."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") != key:
+            return None
+        return ir_from_json(cached["ir"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def save_ir(path: str, key: str, ir: BookIR):
+    """Cache a BookIR at path under key."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "ir": ir_to_json(ir)}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
@@ -0,0 +1,174 @@
+"""
+Block offset manifests and the lookup subcommand.
+
+For every converted book, .bible_processor/blocks/<book>.json maps the Text,
+Footnotes and Outlines notes to the byte offset and length of every block ID in
+them (see blocks.block_spans), in file order:
+
+    {"Text/John.md": {"3-16": [81234, 212], ...}, "Footnotes/JohnN.md": {...}, ...}
+
+With --split chapter, the chapter notes (Text/John/John 3.md) are listed after their
+book notes.
+
+lookup reads a verse, its footnotes and the outline point it belongs to through
+these offsets from memory-mapped notes, without scanning the files, and lists the
+blocks that link to the verse from the backlinks of its book (see backlinks.py):
+
+    python -m bible_processor.main lookup "John 3:16" [vault_folder]
+"""
+import json
+import mmap
+import os
+import re
+
+from .backlinks import load_backlinks
+from .blocks import block_spans
+from .split import chapter_path, vault_link
+from .constants import BOOK_ABBR, BOOK_ABBR_REVERSE, JUBILEE_ABRV_TO_FULL_BOOK, ONE_CHAPTER_BOOKS
+
+BLOCKS_DIR = os.path.join(".bible_processor", "blocks")
+
+_REFERENCE_RE = re.compile(r'^\s*(.+?)\s+(\d+)(?::(\d+))?\s*$')
+_OUTLINE_ID_RE = re.compile(r'o\d+')
+
+
+def _book_key(name: str) -> str:
+    return re.sub(r'\s+', '', name).lower()
+
+# Full book names (John), abbreviations (Gen, 1 John) and Jubilee abbreviations (Joh, 1Jo), by _book_key
+BOOK_NAMES = {}
+for _full, _abbr in BOOK_ABBR.items():
+    BOOK_NAMES[_book_key(_full)] = BOOK_NAMES[_book_key(_abbr)] = _abbr
+for _jubilee, _full in JUBILEE_ABRV_TO_FULL_BOOK.items():
+    BOOK_NAMES.setdefault(_book_key(_jubilee), BOOK_ABBR.get(_full))
+for _abbr, _full in BOOK_ABBR_REVERSE.items():
+    BOOK_NAMES.setdefault(_book_key(_full), _abbr)
+
+
+def blocks_path(output_dir: str, book: str) -> str:
+    return os.path.join(output_dir, BLOCKS_DIR, f"{book}.json")
+
+def save_block_offsets(output_dir: str, book: str, notes: dict):
+    """Record the block offsets of a book's {relative path: content} notes as written by OutputWriter."""
+    path = blocks_path(output_dir, book)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    offsets = {name: block_spans(content, os.linesep) for name, content in notes.items()}
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(offsets, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def load_block_offsets(output_dir: str, book: str) -> dict:
+    """The block offsets of a book, or {} if it has none."""
+    try:
+        with open(blocks_path(output_dir, book), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def parse_reference(reference: str) -> tuple:
+    """(book, chapter, verse) of a reference like "John 3:16"; verse is None for "John 3" or "Jude 5"."""
+    match = _REFERENCE_RE.match(reference)
+    book = BOOK_NAMES.get(_book_key(match.group(1))) if match else None
+    if not book:
+        raise ValueError(f"unknown reference {reference!r}")
+    return book, match.group(2), match.group(3)
+
+def _read_block(vault_dir: str, name: str, block: str, span: list) -> str:
+    """The text of a block of a note, read from the memory-mapped file."""
+    with open(os.path.join(vault_dir, *name.split("/")), "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            text = mapped[span[0]:span[0] + span[1]].decode("utf-8", errors="replace").replace(os.linesep, "\n")
+    # A note edited after the conversion no longer matches its offsets
+    if not text.rstrip().endswith(f"^{block}"):
+        raise KeyError(f"{name} changed since it was converted, convert it again to update its block offsets")
+    return text
+
+def _chapter_note(offsets: dict, name: str, chapter: str) -> str:
+    """The chapter note of a book note if the book was split by chapter, the book note otherwise."""
+    path = chapter_path(name, chapter)
+    return path if path in offsets else name
+
+def _chapter_blocks(offsets: dict, name: str, chapter: str) -> dict:
+    return offsets.get(_chapter_note(offsets, name, chapter), {})
+
+def _referenced_by(vault_dir: str, book: str, chapter: str, verse: str, anchor: str) -> list:
+    """The sources of the backlinks of a verse; links to the verses of one-chapter books name them ^5 or ^1-5."""
+    blocks = load_backlinks(vault_dir, book).get(book, {})
+    sources = list(blocks.get(anchor, []))
+    if anchor != f"{chapter}-{verse}":
+        sources += [source for source in blocks.get(f"{chapter}-{verse}", []) if source not in sources]
+    return sources
+
+def lookup(vault_dir: str, reference: str) -> dict:
+    """
+    The verse of reference (as markdown), its footnotes and its outline point:
+    {"book", "anchor", "verse", "footnotes": [(anchor, text)], "outline": (anchor, text) or None,
+    "referenced_by": [Note#^block]}.
+    """
+    book, chapter, verse = parse_reference(reference)
+    offsets = load_block_offsets(vault_dir, book)
+    if verse is None and book in ONE_CHAPTER_BOOKS:
+        # One-chapter books are cited by verse (Jude 5) as well as by chapter and verse (Jude 1:5)
+        chapter, verse = "1", chapter
+    if verse is None:
+        raise ValueError(f"{reference} names no verse, e.g. {book} {chapter}:1")
+    anchor = f"{chapter}-{verse}"
+    # The verse headers of one-chapter books only give the verse, so their verses are block ^5
+    if book in ONE_CHAPTER_BOOKS and chapter == "1" and verse in _chapter_blocks(offsets, f"Text/{book}.md", chapter):
+        anchor = verse
+    text_note, notes_note, outline_note = (_chapter_note(offsets, name, chapter) for name in (f"Text/{book}.md", f"Footnotes/{book}N.md", f"Outlines/{book}O.md"))
+    text_blocks = offsets.get(text_note, {})
+    if anchor not in text_blocks:
+        raise KeyError(f"{reference} not found in {vault_dir}" + ("" if offsets else f" (no block offsets for {book})"))
+    verse_span = text_blocks[anchor]
+    footnotes = [
+        (note_anchor, _read_block(vault_dir, notes_note, note_anchor, span))
+        for note_anchor, span in offsets.get(notes_note, {}).items()
+        if note_anchor.startswith((f"{chapter}-{verse}x", f"{anchor}x"))
+    ]
+    # The outline point of a verse is the last one before it in the Text note, or in the chapter notes before its own
+    point = None
+    for name, blocks in offsets.items():
+        if not name.startswith(f"Text/{book}"):
+            continue
+        for block, span in blocks.items():
+            if name == text_note and span[0] > verse_span[0]:
+                break
+            if _OUTLINE_ID_RE.fullmatch(block):
+                point = block
+        if name == text_note:
+            break
+    outline_span = offsets.get(outline_note, {}).get(point) if point else None
+    return {
+        "book": book,
+        "anchor": anchor,
+        "verse": _read_block(vault_dir, text_note, anchor, verse_span),
+        "footnotes": footnotes,
+        "outline": (point, _read_block(vault_dir, outline_note, point, outline_span)) if outline_span else None,
+        "referenced_by": [vault_link(vault_dir, *source.split("#^", 1)) for source in _referenced_by(vault_dir, book, chapter, verse, anchor)],
+    }
+
+
+def main(argv: list = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="bible_processor.main lookup", description="Print a verse with its footnotes and outline point.")
+    parser.add_argument("reference", help='Verse reference, e.g. "John 3:16", "1 John 1:9", "Jude 5"')
+    parser.add_argument("vault_dir", nargs="?", default="Bible", help="Output directory of the conversion")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args(argv)
+    try:
+        result = lookup(args.vault_dir, args.reference)
+    except (ValueError, KeyError) as error:
+        parser.exit(1, f"{error.args[0]}\n")
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=1))
+        return
+    print(result["verse"])
+    if result["outline"]:
+        print(f"\nOutline ^{result['outline'][0]}:\n{result['outline'][1]}")
+    for anchor, text in result["footnotes"]:
+        print(f"\nFootnote ^{anchor}:\n{text}")
+    if result["referenced_by"]:
+        print(f"\nReferenced by: {', '.join(result['referenced_by'])}")
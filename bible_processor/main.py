@@ -2,78 +2,481 @@
 Main entry point for Bible processing scripts.
 """
 
+import contextlib
+import io
 import os
+import re
 import sys
-from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from .constants import BOOK_ABBR, JUBILEE_ABRV_TO_FULL_BOOK
-from .parsers import parse_text, pre_process_footnotes, parse_footnotes, parse_outline
+from .anchor_index import FootnoteAnchors, RefsHashes, load_anchor_index, save_anchor_index
+from .manifest import RecordingRefs, book_entry, input_hashes, is_up_to_date, load_manifest, manifest_options, save_manifest
+from .blocks import book_order
+from .backlinks import book_links, links_path, save_backlinks, save_book_links
+from .bundle import ZipBundle
+from .lookup import blocks_path, save_block_offsets
+from .search import book_documents, has_segment, save_segment
+from .split import SPLIT_MODES, book_notes, chapter_paths, split_book, unsplit_links
+from .sqlite_export import SqliteExport, entry_digest
+from .writer import OutputWriter
+from .ir import ir_cache_key, ir_cache_path, load_ir, save_ir
+from .parsers import PARSER_BACKENDS, extract_book, load_footnotes, read_html, set_parser_backend
+from .pipeline import IO_DEPTH, WriteBehind, read_ahead
+from .render import RENDER_TARGETS, render_book, render_obsidian
+from . import inputs, parsers, profiling
 from tqdm import tqdm
 
-def process_all_files(folder_path: str, output_dir: str, book_name: str = None):
-    """Process all HTML files in a folder and insert footnotes into the database."""
-    all_files = [f for f in os.listdir(folder_path) if f.endswith("N.htm")]
+
+def _init_worker(parser_backend: str, profile: bool, cprofile_dir: str, profile_memory: bool):
+    """Carry the parent's module-level settings over to a pool worker."""
+    set_parser_backend(parser_backend)
+    if profile:
+        # A forked worker inherits the parent's profiler, with the statistics the parent already has
+        profiling.install(cprofile_dir, profile_memory).reset()
+
+def _run_captured(key: str, phase: str, func, *args):
+    """
+    Run func(*args) for the book key and return its result together with everything
+    it printed and its profiling statistics.
+    """
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        with profiling.book(key, phase):
+            result = func(*args)
+    stats = profiling.ACTIVE.collect() if profiling.ACTIVE else None
+    return result, buffer.getvalue(), stats
+
+def _read_book(text_file: str, footnotes, outline_file: str, current_book: str, all_refs: dict,
+               ir_path: str = None, ir_key: str = None, targets: list = ("obsidian",), force: bool = False):
+    """
+    Read stage of _convert_book (same arguments): the book's cached IR, or None and
+    the contents of the HTML files it is extracted from.
+    """
+    ir = load_ir(ir_path, ir_key) if ir_path and not force else None
+    if ir is not None:
+        return ir, None
+    files = [text_file, outline_file] + ([footnotes] if isinstance(footnotes, str) else [])
+    return None, {path: read_html(path) for path in files if inputs.exists(path)}
+
+def _convert_book(text_file: str, footnotes, outline_file: str, current_book: str, all_refs: dict,
+                  ir_path: str = None, ir_key: str = None, targets: list = ("obsidian",), force: bool = False,
+                  sources: tuple = None):
+    """
+    Convert one book's text, footnotes and outline to the files of the render targets.
+
+    footnotes are the notes from load_footnotes, or the footnotes file if its anchors
+    came from the anchor index and it was not parsed yet. With ir_path, the book's IR
+    is taken from there if it was cached under ir_key (unless force) and cached there
+    otherwise. sources is what _read_book returned for these arguments, if the book
+    was read ahead.
+    Returns {relative path: content}, the books whose anchor mappings were used to
+    resolve links, the book's search documents (see search.book_documents) and its
+    outgoing block links (see backlinks.book_links).
+    """
+    if sources is None:
+        sources = _read_book(text_file, footnotes, outline_file, current_book, all_refs, ir_path, ir_key, targets, force)
+    ir, contents = sources
+    if ir is None:
+        ir = extract_book(text_file, footnotes, outline_file, current_book, contents)
+        if ir_path:
+            save_ir(ir_path, ir_key, ir)
+    refs, links = RecordingRefs(all_refs), []
+    files = render_book(ir, refs, targets, links)
+    return files, refs.used, list(book_documents(ir)), book_links(links)
+
+def _book_ir(text_file: str, note_file: str, outline_file: str, current_book: str, ir_path: str, ir_key: str):
+    """The IR of a book from the cache, or extracted (and cached) if it is not cached under ir_key."""
+    ir = load_ir(ir_path, ir_key)
+    if ir is None:
+        ir = extract_book(text_file, note_file, outline_file, current_book)
+        save_ir(ir_path, ir_key, ir)
+    return ir
+
+def _input_size(*paths: str) -> int:
+    """Total size of the given input files, used to schedule the largest books first."""
+    return sum(inputs.getsize(p) for p in paths if inputs.exists(p))
+
+# Estimated peak memory of a pool worker converting a book: the interpreter with its
+# modules (about 33 MB), and the soup, strings and IR per byte of the book's HTML
+# (--profile-memory peaks at about 17 bytes per byte, plus allocator overhead)
+WORKER_MEMORY = 40 * 2**20
+MEMORY_PER_INPUT_BYTE = 20
+
+def book_memory(size: int) -> int:
+    """Estimated peak memory of a pool worker converting HTML inputs of size bytes."""
+    return WORKER_MEMORY + MEMORY_PER_INPUT_BYTE * size
+
+def _run_tasks(func, tasks: dict, jobs: int, desc: str, sizes: dict = None, phase: str = "",
+               read=None, io_depth: int = IO_DEPTH, max_memory: int = None):
+    """
+    Yield (key, result) for every task in tasks ({key: args}).
+
+    With jobs <= 1 the tasks run in-process in the given order; with read, read(*args)
+    of the next io_depth tasks runs in a background thread (see pipeline.read_ahead)
+    and is passed to func as an extra argument. Otherwise they are fanned out over a
+    process pool, largest input (sizes[key]) first, and anything the workers printed
+    (warnings) is replayed in the parent as each task completes.
+
+    With max_memory, a task only starts while the estimated memory (see book_memory)
+    of the running tasks stays within it, so fewer than jobs run at once if needed;
+    a task that does not fit runs alone.
+    """
+    if jobs <= 1:
+        items = tasks.items()
+        if read:
+            items = ((key, args + (data,)) for key, args, data in read_ahead(items, read, io_depth))
+        for key, args in tqdm(items, total=len(tasks), desc=desc, unit="book"):
+            with profiling.book(key, phase):
+                result = func(*args)
+            yield key, result
+        return
+    sizes = sizes or {}
+    pending = sorted(tasks, key=lambda key: sizes.get(key, 0), reverse=True)
+    profiler = profiling.ACTIVE
+    initargs = (parsers.PARSER_BACKEND, profiler is not None, profiler.cprofile_dir if profiler else None,
+                profiler is not None and profiler.memory)
+    pool_size = jobs
+    if max_memory:
+        # Workers are started up front, so the pool only gets as many as the budget could ever run at once
+        pool_size = max(1, min(jobs, max_memory // book_memory(min((sizes.get(key, 0) for key in tasks), default=0))))
+    # The running tasks: {future: (key, estimated memory)}
+    running, most_running = {}, 0
+
+    def start_tasks():
+        # Start the largest tasks that fit in the memory budget next to the running ones
+        nonlocal most_running
+        for key in list(pending):
+            if len(running) >= pool_size:
+                break
+            memory = book_memory(sizes.get(key, 0))
+            if max_memory and running and sum(m for _, m in running.values()) + memory > max_memory:
+                continue
+            if max_memory and memory > max_memory:
+                tqdm.write(f"Warning: {key} needs about {memory >> 20} MB, more than --max-memory; converting it alone.")
+            pending.remove(key)
+            running[executor.submit(_run_captured, key, phase, func, *tasks[key])] = (key, memory)
+        most_running = max(most_running, len(running))
+
+    with ProcessPoolExecutor(max_workers=pool_size, initializer=_init_worker, initargs=initargs) as executor:
+        with tqdm(total=len(tasks), desc=desc, unit="book") as progress:
+            start_tasks()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                finished = [(running.pop(future)[0], future) for future in done]
+                # Keep the workers busy while the results are handled
+                start_tasks()
+                for key, future in finished:
+                    result, output, stats = future.result()
+                    if output:
+                        tqdm.write(output.rstrip("\n"))
+                    if stats:
+                        profiler.merge(stats)
+                    progress.update(1)
+                    yield key, result
+    if max_memory and most_running < min(jobs, len(tasks)):
+        print(f"The memory budget allowed {most_running} of {jobs} workers to run at once.")
+
+def _note_names(current_book: str):
+    """Relative paths of the text, footnote and outline notes of a book, as render.render_obsidian names them."""
+    return (f"Text/{current_book}.md", f"Footnotes/{current_book}N.md", f"Outlines/{current_book}O.md")
+
+def _output_paths(output_dir: str, current_book: str):
+    """Paths of the text, footnote and outline notes of a book."""
+    return tuple(os.path.join(output_dir, *name.split("/")) for name in _note_names(current_book))
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _read_notes(output_dir: str, current_book: str) -> dict:
+    """The Text, Footnotes and Outlines notes of a book as written, each book note followed by its chapter notes (see split.py)."""
+    notes = {}
+    for name, path in zip(_note_names(current_book), _output_paths(output_dir, current_book)):
+        notes[name] = _read(path)
+        for chapter_name in chapter_paths(output_dir, name):
+            notes[chapter_name] = _read(os.path.join(output_dir, *chapter_name.split("/")))
+    return notes
+
+def _rendered_notes(current_book: str, notes: dict) -> dict:
+    """The Text, Footnotes and Outlines notes of a book as rendered, joining the chapter notes among notes back into their book notes."""
+    rendered = {}
+    for name in _note_names(current_book):
+        parts = [content for path, content in notes.items() if path == name or path.startswith(f"{name[:-len('.md')]}/")]
+        rendered[name] = unsplit_links("\n\n".join(part.rstrip("\n") for part in parts) + "\n" if len(parts) > 1 else parts[0])
+    return rendered
+
+def _remove_chapter_notes(output_dir: str, current_book: str, keep: dict = None):
+    """
+    Remove the chapter notes of a book that are not in keep: all of them after a --split
+    chapter run, or those of chapters the book is no longer split into.
+    """
+    for name in _note_names(current_book):
+        paths = [path for path in chapter_paths(output_dir, name) if path not in (keep or {})]
+        for chapter_name in paths:
+            os.remove(os.path.join(output_dir, *chapter_name.split("/")))
+        if paths:
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.join(output_dir, *name[:-len(".md")].split("/")))
+
+def process_all_files(folder_path: str, output_dir: str, book_name: str = None, jobs: int = 1, force: bool = False,
+                      profile: str = None, cprofile_dir: str = None, books: list = None, state: dict = None,
+                      sqlite: str = None, targets: list = ("obsidian",), io_depth: int = IO_DEPTH, bundle: str = None,
+                      split: str = "book", max_memory: int = None, profile_memory: bool = False):
+    """
+    Process all HTML files in a folder and insert footnotes into the database.
+
+    Only book_name or the books in books are converted if given. Books whose inputs
+    and referenced footnote anchors are unchanged since the last run (see
+    manifest.py) are skipped unless force is set. With profile, per-book stage
+    timings are written to that JSON file (see profiling.py), with profile_memory
+    including the peak and net memory allocation of every book and stage, and with
+    cprofile_dir a cProfile dump of every book is written there. With max_memory (in
+    bytes), fewer than jobs books are converted at once if their estimated memory
+    would exceed it (see _run_tasks).
+
+    The IR of every book is cached (see ir.py), so books whose HTML did not change are
+    rendered again without parsing it. targets are the render targets (see render.py);
+    obsidian is always rendered.
+
+    With sqlite, the verses, footnotes and outline points of the selected books are
+    also written to that SQLite database (see sqlite_export.py).
+
+    Reading and writing overlap with the conversion: the inputs of the next io_depth
+    books are read ahead (in serial mode; pool workers read their own) and the notes
+    are written behind it (see pipeline.py). io_depth 0 reads and writes in turn.
+
+    The verses and footnotes of every converted book are indexed for the search
+    subcommand (see search.py), and the byte offsets of the block IDs of its notes
+    are recorded for the lookup subcommand (see lookup.py). Its outgoing links are
+    recorded too, and the backlinks of all books are rebuilt from them after a run
+    that converted any book (see backlinks.py).
+
+    With bundle, the notes are written to that zip archive instead of the output
+    folder (see bundle.py); the output folder only keeps the caches. A bundle is built
+    from all selected books every time, which the IR cache keeps cheap.
+
+    With split "chapter", the Text and Footnotes notes are written as one note per
+    chapter (see split.py); the SQLite export is built from the notes as rendered,
+    the search index and backlinks from the IR.
+
+    A state dict passed to repeated calls keeps the loaded footnote anchors and the
+    manifest in memory between them (used by watch mode).
+    """
+    all_files = [f for f in inputs.listdir(folder_path) if f.endswith("N.htm")]
     base_files = [os.path.splitext(f)[0][:-1] for f in all_files]  # Remove 'N' before .htm
     print(f"Found {len(base_files)} books to process.")
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if profile or cprofile_dir:
+        profiling.install(cprofile_dir, profile_memory)
 
-    # First run: find all footnote references
-    all_refs = {}
-    for base in tqdm(base_files, desc="Pre-processing footnotes", unit="book"):
-        note_file = os.path.join(folder_path, f"{base}N.htm")
-        if not os.path.exists(note_file):
-            continue
+    note_files = {}
+    for base in base_files:
         current_book_long = JUBILEE_ABRV_TO_FULL_BOOK.get(base)
-        current_book = BOOK_ABBR.get(current_book_long)
-        all_refs[current_book] = pre_process_footnotes(note_file)
+        note_files[BOOK_ABBR.get(current_book_long)] = os.path.join(folder_path, f"{base}N.htm")
+    selected = set(books or []) | ({book_name} if book_name else set())
+    for name in sorted(selected - set(note_files)):
+        print(f"Warning: Book {name} not found in {folder_path}.")
+    # Links are rewritten for the layout of the run (see split.py), so a vault changes layout all at once
+    previous = manifest_options(output_dir)
+    if selected and not bundle and previous is not None and previous.get("split", "book") != split:
+        print(f"Warning: {output_dir} was converted with --split {previous.get('split', 'book')}; converting every book with --split {split}.")
+        selected = set()
+    if selected:
+        print(f"Processing only: {', '.join(sorted(selected))}")
 
-    if book_name:
-        print(f"Processing only book: {book_name}")
-    for base in tqdm(base_files, desc="Processing books", unit="book"):
+    # Footnote anchors are loaded on demand: from the index if the footnotes file is
+    # unchanged since the last run, by scanning it otherwise. The footnotes of the
+    # books to convert are scanned up front, and with several jobs every changed
+    # footnotes file, so that pool workers never scan one themselves.
+    targets = ["obsidian"] + [target for target in targets if target != "obsidian"]
+    options = {"parser": parsers.PARSER_BACKEND, "targets": targets, "split": split}
+    # The anchors only depend on how the footnote files are parsed
+    anchor_options = {"parser": parsers.PARSER_BACKEND}
+    state = state if state is not None else {}
+    if not force and state.get("anchor_options") == anchor_options:
+        anchor_index, all_refs = state["anchor_index"], state["all_refs"]
+        all_refs.refresh(note_files)
+    else:
+        anchor_index = {"version": None, "books": {}} if force else load_anchor_index(output_dir, anchor_options)
+        all_refs = FootnoteAnchors(note_files, anchor_index)
+    pre_tasks, pre_sizes = {}, {}
+    for current_book, note_file in note_files.items():
+        if (jobs > 1 or not selected or current_book in selected) and all_refs.is_stale(current_book):
+            pre_tasks[current_book] = (note_file,)
+            pre_sizes[current_book] = _input_size(note_file)
+    for current_book, (refs, notes) in _run_tasks(load_footnotes, pre_tasks, jobs, "Pre-processing footnotes", pre_sizes, "footnotes",
+                                                  read_html, io_depth, max_memory):
+        all_refs.add(current_book, refs, notes)
+    if anchor_index.get("changed"):
+        save_anchor_index(output_dir, anchor_index, anchor_options)
+    current_refs_hashes = RefsHashes(all_refs)
+    if force or bundle:
+        manifest = {"version": None, "books": {}}
+    elif state.get("options") == options:
+        manifest = state["manifest"]
+    else:
+        manifest = load_manifest(output_dir, options)
+    state.update(options=options, anchor_options=anchor_options, anchor_index=anchor_index, all_refs=all_refs, manifest=manifest)
+
+    book_tasks, book_sizes, book_inputs, book_files = {}, {}, {}, {}
+    skipped = []
+    for base in base_files:
         note_file = os.path.join(folder_path, f"{base}N.htm")
         outline_file = os.path.join(folder_path, f"{base}O.htm")
         text_file = os.path.join(folder_path, f"{base}.htm")
-        if not (os.path.exists(note_file) and os.path.exists(text_file)):
+        if not (inputs.exists(note_file) and inputs.exists(text_file)):
             continue
         current_book_long = JUBILEE_ABRV_TO_FULL_BOOK.get(base)
         current_book = BOOK_ABBR.get(current_book_long)
-        if book_name and current_book != book_name:
+        if selected and current_book not in selected:
+            continue
+        book_inputs[current_book] = input_hashes([text_file, note_file, outline_file])
+        book_files[current_book] = (text_file, note_file, outline_file)
+        if is_up_to_date(manifest, current_book, book_inputs[current_book], _output_paths(output_dir, current_book), current_refs_hashes):
+            skipped.append(current_book)
             continue
-        text = parse_text(text_file, current_book, all_refs)
-        notes = parse_footnotes(note_file, current_book, all_refs)
-        outline = parse_outline(outline_file, current_book)
-
-
-        chapter_path = os.path.join(output_dir, "Text", f"{current_book}.md")
-        chapter_note_path = os.path.join(output_dir, "Footnotes", f"{current_book}N.md")
-        outline_path = os.path.join(output_dir, "Outlines", f"{current_book}O.md")
-        Path(os.path.dirname(chapter_path)).mkdir(parents=True, exist_ok=True)
-        Path(os.path.dirname(chapter_note_path)).mkdir(parents=True, exist_ok=True)
-        Path(os.path.dirname(outline_path)).mkdir(parents=True, exist_ok=True)
-        with open(chapter_path, "w", encoding="utf-8") as f:
-            f.write(text)
-        with open(chapter_note_path, "w", encoding="utf-8") as f:
-            f.write(notes)
-        with open(outline_path, "w", encoding="utf-8") as f:
-            f.write(outline)
+        ir_key = ir_cache_key(book_inputs[current_book], parsers.PARSER_BACKEND)
+        book_tasks[current_book] = (text_file, all_refs.notes(current_book), outline_file, current_book, all_refs,
+                                    ir_cache_path(output_dir, current_book), ir_key, targets, force)
+        book_sizes[current_book] = _input_size(text_file, note_file, outline_file)
+    if skipped:
+        print(f"Skipping {len(skipped)} unchanged books.")
+    # Serial runs convert the books in Bible order
+    book_tasks = dict(sorted(book_tasks.items(), key=lambda item: book_order(item[0])))
 
+    # Only files whose content changed are rewritten, see writer.py
+    writer = OutputWriter(output_dir)
+    archive = ZipBundle(bundle, list(book_tasks)) if bundle else None
+    template_path = os.path.join(os.path.dirname(__file__), "..", "templates", "Bible.base")
+    if archive and os.path.exists(template_path):
+        with open(template_path, "rb") as f:
+            archive.add_file("Bible.base", f.read())
+    elif book_tasks:
         # Copy Bible.base template into the output base path if it exists
-        template_path = os.path.join(os.path.dirname(__file__), "..", "templates", "Bible.base")
-        output_base_path = os.path.join(output_dir, "Bible.base")
-        if os.path.exists(template_path) and not os.path.exists(output_base_path):
-          Path(os.path.dirname(output_base_path)).mkdir(parents=True, exist_ok=True)
-          with open(template_path, "r", encoding="utf-8") as src, open(output_base_path, "w", encoding="utf-8") as dst:
-            dst.write(src.read())
+        writer.copy_if_missing(template_path, os.path.join(output_dir, "Bible.base"))
+
+    sink = SqliteExport(sqlite) if sqlite else None
+    with WriteBehind(writer, 0 if archive else 3 * io_depth) as output, archive or contextlib.nullcontext():
+        for current_book, (files, depends, documents, links) in _run_tasks(_convert_book, book_tasks, jobs, "Processing books", book_sizes, "convert",
+                                                         _read_book, io_depth, max_memory):
+            written = split_book(current_book, files) if split == "chapter" else files
+            if archive:
+                archive.add_book(current_book, written)
+            else:
+                _remove_chapter_notes(output_dir, current_book, written)
+                for path, content in written.items():
+                    output.write(os.path.join(output_dir, *path.split("/")), content)
+            manifest["books"][current_book] = book_entry(book_inputs[current_book], depends, current_refs_hashes)
+            text, notes, outline = (files[name] for name in _note_names(current_book))
+            save_segment(output_dir, current_book, documents)
+            if not archive:
+                save_block_offsets(output_dir, current_book, book_notes(current_book, written))
+            save_book_links(output_dir, current_book, links)
+            if sink:
+                sink.add_book(current_book, text, notes, outline, entry_digest(manifest["books"][current_book]))
+
+    # Unchanged books get their block offsets from their markdown if they have none yet, and their search index
+    # segment and links from their (cached) IR
+    links_changed = bool(book_tasks)
+    for current_book in skipped:
+        missing = (not has_segment(output_dir, current_book), not os.path.exists(blocks_path(output_dir, current_book)),
+                   not os.path.exists(links_path(output_dir, current_book)))
+        if not any(missing):
+            continue
+        if missing[0] or missing[2]:
+            ir_key = ir_cache_key(book_inputs[current_book], parsers.PARSER_BACKEND)
+            ir = _book_ir(*book_files[current_book], current_book, ir_cache_path(output_dir, current_book), ir_key)
+        if missing[0]:
+            save_segment(output_dir, current_book, book_documents(ir))
+        if missing[1]:
+            save_block_offsets(output_dir, current_book, _read_notes(output_dir, current_book))
+        if missing[2]:
+            links = []
+            render_obsidian(ir, all_refs, links)
+            save_book_links(output_dir, current_book, book_links(links))
+            links_changed = True
+    if links_changed:
+        save_backlinks(output_dir)
 
+    if sink:
+        # Unchanged books are exported from their markdown if the database does not have them yet
+        for current_book in skipped:
+            digest = entry_digest(manifest["books"][current_book])
+            if sink.digest(current_book) != digest:
+                sink.add_book(current_book, *_rendered_notes(current_book, _read_notes(output_dir, current_book)).values(), digest)
+        sink.close()
 
+    if archive:
+        print(archive.summary())
+    elif book_tasks:
+        save_manifest(output_dir, manifest, options)
+        print(writer.summary())
+    if anchor_index.get("changed"):
+        save_anchor_index(output_dir, anchor_index, anchor_options)
+    if selected:
+        print(f"Loaded the footnote anchors of {len(all_refs.loaded())} of {len(all_refs)} books ({len(all_refs.scanned)} scanned).")
+    if profile:
+        profiling.ACTIVE.write_report(profile)
+        print(f"Wrote profile report to {profile}")
 
 
-def main():
+
+
+# Subcommands (python -m bible_processor.main <name> ...) and the modules whose main() runs them
+SUBCOMMANDS = {"validate": ".validate", "search": ".search", "lookup": ".lookup"}
+
+def _memory_size(value: str) -> int:
+    """Parse a --max-memory value like 512M, 2G or a number of bytes."""
+    import argparse
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([KMG]?)B?', value.strip(), re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid memory size {value!r}, e.g. 512M or 2G")
+    return int(float(match.group(1)) * 1024 ** " KMG".index(match.group(2).upper() or " "))
+
+def main(argv: list = None):
     import argparse
+    import importlib
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in SUBCOMMANDS:
+        return importlib.import_module(SUBCOMMANDS[argv[0]], __package__).main(argv[1:])
     parser = argparse.ArgumentParser(description="Process Bible HTML files to markdown.")
-    parser.add_argument("input_dir", nargs="?", default="RcvBible_Footnotes/Jubilee Bible", help="Input directory containing HTML files")
+    parser.add_argument("input_dir", nargs="?", default="RcvBible_Footnotes/Jubilee Bible", help="Input directory containing HTML files, or a .zip/.tar(.gz) archive of them")
     parser.add_argument("output_dir", nargs="?", default="Bible", help="Output directory for markdown files")
     parser.add_argument('--book_name', type=str, help="Name of the book to process (optional)")
-    args = parser.parse_args()
-    process_all_files(args.input_dir, args.output_dir, args.book_name)
+    parser.add_argument('--books', type=str, help="Comma-separated names of the books to process, e.g. Gen,Exo,Matt (optional)")
+    parser.add_argument('--jobs', type=int, default=1, help="Number of worker processes (1 = serial, 0 = one per CPU core)")
+    parser.add_argument('--io-depth', type=int, default=IO_DEPTH, help="Books read ahead of and written behind the conversion (0 = read and write in turn)")
+    parser.add_argument('--force', action='store_true', help="Reconvert all books, even those unchanged since the last run")
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default="html.parser", help="HTML parser backend (auto = lxml if installed, else html.parser)")
+    parser.add_argument('--targets', default="obsidian", help=f"Comma-separated render targets ({', '.join(RENDER_TARGETS)}); obsidian is always rendered")
+    parser.add_argument('--split', choices=SPLIT_MODES, default="book", help="Write one Text and Footnotes note per book or per chapter")
+    parser.add_argument('--bundle', metavar="ZIP", help="Write the notes to this zip archive instead of the output folder")
+    parser.add_argument('--sqlite', metavar="DATABASE", help="Also write verses, footnotes and outline points to this SQLite database")
+    parser.add_argument('--watch', action='store_true', help="Keep running and reconvert the books whose input files change")
+    parser.add_argument('--profile', metavar="REPORT", help="Write per-book, per-stage timings to this JSON file")
+    parser.add_argument('--profile-memory', action='store_true', help="With --profile, also record the peak and net memory allocation of every book and stage (slow)")
+    parser.add_argument('--max-memory', type=_memory_size, metavar="SIZE", help="Convert fewer books at once with --jobs if their estimated memory would exceed this, e.g. 2G")
+    parser.add_argument('--cprofile-dir', help="Write a cProfile dump (<book>-<phase>.prof) per book to this directory")
+    args = parser.parse_args(argv)
+    set_parser_backend(args.parser)
+    books = args.books.split(",") if args.books else None
+    targets = args.targets.split(",")
+    for target in targets:
+        if target not in RENDER_TARGETS:
+            parser.error(f"unknown render target {target!r}, expected one of {', '.join(RENDER_TARGETS)}")
+    if args.profile_memory and not args.profile:
+        parser.error("--profile-memory requires --profile")
+    if args.watch and args.bundle:
+        parser.error("--bundle cannot be combined with --watch")
+    if args.watch:
+        from .watch import watch
+        watch(args.input_dir, args.output_dir, args.book_name, args.jobs, args.force, books, sqlite=args.sqlite, targets=targets,
+              split=args.split, max_memory=args.max_memory)
+        return
+    process_all_files(args.input_dir, args.output_dir, args.book_name, args.jobs, args.force, args.profile, args.cprofile_dir,
+                      books, sqlite=args.sqlite, targets=targets, io_depth=args.io_depth, bundle=args.bundle,
+                      split=args.split, max_memory=args.max_memory, profile_memory=args.profile_memory)
 
 if __name__ == "__main__":
     main()
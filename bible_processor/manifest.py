@@ -0,0 +1,110 @@
+"""
+Content-hash manifest used to skip books whose inputs did not change since the last run.
+"""
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+from . import inputs
+
+MANIFEST_FILE = os.path.join(".bible_processor", "manifest.json")
+
+
+def file_hash(path: str) -> str:
+    """Return the sha256 of an input file's content, or "" if it does not exist."""
+    if not inputs.exists(path):
+        return ""
+    return hashlib.sha256(inputs.read_bytes(path)).hexdigest()
+
+def refs_hash(refs: dict) -> str:
+    """Return a stable hash of one book's footnote anchor mapping."""
+    return hashlib.sha256(json.dumps(refs, sort_keys=True).encode("utf-8")).hexdigest()
+
+def pipeline_version() -> str:
+    """Hash of the package sources, so that any code change invalidates all books."""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith(".py"):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(package_dir, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class RecordingRefs(Mapping):
+    """Read-only view of all_refs that records which books' anchor mappings were used."""
+
+    def __init__(self, all_refs: Mapping):
+        self._all_refs = all_refs
+        self.used = set()
+
+    def __getitem__(self, book):
+        refs = self._all_refs[book]
+        self.used.add(book)
+        return refs
+
+    def __iter__(self):
+        return iter(self._all_refs)
+
+    def __len__(self):
+        return len(self._all_refs)
+
+
+def load_manifest(output_dir: str, options: dict = None) -> dict:
+    """
+    Load the manifest of a previous run, or an empty one if it was written by other
+    code or with other output-affecting options.
+    """
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": None, "books": {}}
+    if manifest.get("version") != pipeline_version() or manifest.get("options", {}) != (options or {}):
+        return {"version": None, "books": {}}
+    return manifest
+
+def manifest_options(output_dir: str):
+    """The options the manifest of the previous run was written with, or None if there is none."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("options", {})
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def save_manifest(output_dir: str, manifest: dict, options: dict = None):
+    """Write the manifest for the current pipeline version and options."""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    manifest["version"] = pipeline_version()
+    manifest["options"] = options or {}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+def input_hashes(input_files: list) -> dict:
+    """Map the file names of a book's inputs to their content hashes."""
+    return {os.path.basename(path): file_hash(path) for path in input_files}
+
+def book_entry(inputs: dict, depends: set, current_refs_hashes: dict) -> dict:
+    """Manifest entry of a book: its input hashes and the anchor mappings it resolved links through."""
+    return {
+        "inputs": inputs,
+        "depends": {book: current_refs_hashes.get(book, "") for book in sorted(depends)},
+    }
+
+def is_up_to_date(manifest: dict, book: str, inputs: dict, output_files: list, current_refs_hashes: dict) -> bool:
+    """
+    True if the book's inputs, the anchor mappings it depends on and its outputs are
+    unchanged since the manifest was written.
+    """
+    entry = manifest["books"].get(book)
+    if not entry:
+        return False
+    if not all(os.path.exists(path) for path in output_files):
+        return False
+    if inputs != entry.get("inputs"):
+        return False
+    return all(current_refs_hashes.get(dep, "") == dep_hash for dep, dep_hash in entry.get("depends", {}).items())
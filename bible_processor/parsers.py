@@ -1,56 +1,127 @@
 """
 Parsing functions for text, footnotes, and outlines.
+
+The extract_* functions and load_footnotes turn the HTML files into the IR of ir.py;
+render.py turns that into markdown. parse_text, parse_footnotes and parse_outline do
+both.
 """
-from typing import Dict, Any
 from bs4 import BeautifulSoup
-from .constants import BOOK_ABBR, JUBILEE_ABRV_TO_FULL_BOOK, BOOK_ABBR_REVERSE, OUTLINE_MAP
-from .utils import add_verse_anchors, combine_nav_and_verse_lines, combine_split_verses, convert_to_obsidian_link, ensure_empty_line_before_dashes, extract_properties, extract_verse_spec, insert_frontmatter_and_final_cleanup, map_outline_lines, merge_top_chapters_line, outline_with_spacing
+from .utils import LINK_PLACEHOLDER, convert_to_obsidian_link, extract_link, extract_property_pairs, extract_verse_spec, free_tree, free_trees
 import re
 from .utils import (
     replace_tags,
     insert_newlines_before_br,
-    cleanup_markdown,
-    merge_multiline_chapter_links,
-    add_chapter_anchors,
-    replace_bible_links,
-    remove_unwanted_lines_and_separate_verse_outline,
-    update_front_matter_with_subject,
 )
+from . import inputs
+from .ir import BookIR, BookText, Footnote, OutlinePoint, Passage, Verse
+from .render import render_footnotes, render_outline, render_text
 
+# Tree builder handed to BeautifulSoup by all parsers, see set_parser_backend
+PARSER_BACKEND = "html.parser"
+PARSER_BACKENDS = ("html.parser", "lxml", "auto")
 
-def pre_process_footnotes(html_file: str) -> dict:
-    """Preprocess footnotes to build anchor mapping."""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    soup = BeautifulSoup(html_content, 'html.parser')
-    all_refs = {}
+# A run of <a name="..."> anchors directly followed by a <p>, as html.parser sees it in the source
+_ANCHOR_RUN_RE = re.compile(r'(?:<a\b[^>]*\bname\s*=[^>]*>[^<]*</a>)+<p\b', re.IGNORECASE)
+_ANCHOR_NAME_RE = re.compile(r'<a\b[^>]*\bname\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+
+
+def set_parser_backend(name: str) -> str:
+    """
+    Select the tree builder used for parsing: "lxml", "html.parser", or "auto" for lxml
+    if it is installed. Falls back to html.parser if lxml is not installed and returns
+    the backend in use.
+    """
+    global PARSER_BACKEND
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend {name!r}, expected one of {', '.join(PARSER_BACKENDS)}")
+    if name in ("auto", "lxml"):
+        try:
+            import lxml  # noqa: F401
+            name = "lxml"
+        except ImportError:
+            if name == "lxml":
+                print("Warning: lxml is not installed, falling back to html.parser.")
+            name = "html.parser"
+    PARSER_BACKEND = name
+    return name
+
+def _footnote_anchor(name: str) -> str:
+    """Turn an <a name> of a footnotes file (e.g. n1_1x1aP2) into its block anchor (1-1x1a)."""
+    if name.startswith('n'):
+        name = name[1:]
+    name = name.replace('_', '-')
+    return re.sub(r'P\d+$', '', name)
+
+def make_soup(html_content: str, backend: str = None) -> BeautifulSoup:
+    """Parse HTML with the selected parser backend."""
+    return BeautifulSoup(html_content, backend or PARSER_BACKEND)
+
+# The tags of the outline points of an outline file
+OUTLINE_TAGS = ['kbd', 'em', 'h6', 'dfn', 'big', 'samp']
+
+def _anchor_runs(soup: BeautifulSoup) -> list:
+    """Return, for every <p> preceded by <a name> siblings, the names of those anchors in document order."""
+    runs = []
     for p in soup.find_all('p'):
         anchors = []
         prev = p.previous_sibling
         while prev and getattr(prev, 'name', None) == 'a' and prev.has_attr('name'):
-            anchor_name = prev['name']
-            if anchor_name.startswith('n'):
-                anchor_name = anchor_name[1:]
-            anchor_name = anchor_name.replace('_', '-')
-            anchor_name = re.sub(r'P\d+$', '', anchor_name)
-            anchors.insert(0, anchor_name)
+            anchors.insert(0, prev['name'])
             prev = prev.previous_sibling
         if anchors:
-            last_anchor = anchors[-1]
-            for anchor in anchors:
-                all_refs[anchor] = last_anchor
-    return all_refs
+            runs.append(anchors)
+    return runs
 
-def parse_footnotes(html_file: str, current_book: str, all_refs: dict) -> str:
-    """Parse footnotes HTML to markdown."""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    soup = BeautifulSoup(html_content, 'html.parser')
-    for tag in soup(['head', 'h3', 'pre']):
-        tag.decompose()
+def _scan_anchor_runs(html_content: str) -> list:
+    """Find the same anchor runs as _anchor_runs by scanning the HTML source."""
+    return [
+        [next(g for g in name.groups() if g is not None) for name in _ANCHOR_NAME_RE.finditer(run.group(0))]
+        for run in _ANCHOR_RUN_RE.finditer(html_content)
+    ]
+
+
+def pre_process_footnotes(html_file: str) -> dict:
+    """Preprocess footnotes to build anchor mapping."""
+    refs, _ = load_footnotes(html_file)
+    return refs
+
+def read_html(html_file: str) -> str:
+    """The contents of an HTML input file, in a folder or an archive (see inputs.py)."""
+    return inputs.read_text(html_file)
+
+def load_footnotes(html_file: str, html_content: str = None) -> tuple:
+    """
+    Parse a footnotes HTML file once, returning its anchor mapping and its notes.
+
+    The notes are (anchor, text, links) entries in output order, where the links of
+    the text are still LINK_PLACEHOLDER markers for the (href, name, text) entries in
+    links, so that they can be rendered by render_footnotes once all anchor mappings
+    are known. html_content is the contents of html_file if it was read already.
+    """
+    if html_content is None:
+        html_content = read_html(html_file)
+    soup = make_soup(html_content)
+    runs = _anchor_runs(soup)
+    if PARSER_BACKEND != "html.parser" and runs != _scan_anchor_runs(html_content):
+        # The notes are keyed by the <a name> anchors in front of each <p>; only trust
+        # another tree builder if it kept them in the same order as html.parser does.
+        print(f"Warning: {PARSER_BACKEND} changed the footnote anchor order of {html_file}, using html.parser.")
+        soup = make_soup(html_content, "html.parser")
+        runs = _anchor_runs(soup)
+    all_refs = {}
+    for anchors in runs:
+        anchors = [_footnote_anchor(name) for name in anchors]
+        last_anchor = anchors[-1]
+        for anchor in anchors:
+            all_refs[anchor] = last_anchor
+
+    tags = soup(['head', 'h3', 'pre'])
+    for tag in tags:
+        tag.extract()
+    free_trees(tags)
     for br in soup.find_all("br"):
         br.insert_before("\n")
-        br.unwrap()
+        free_tree(br.unwrap())
     anchor_to_p = {}
     sorted_anchor_list = []
     for p in soup.find_all('p'):
@@ -58,51 +129,42 @@ def parse_footnotes(html_file: str, current_book: str, all_refs: dict) -> str:
         while prev and not (getattr(prev, 'name', None) == 'a' and prev.has_attr('name')):
             prev = prev.previous_sibling
         if prev and prev.name == 'a' and prev.has_attr('name'):
-            anchor_name = prev['name']
-            if anchor_name.startswith('n'):
-                anchor_name = anchor_name[1:]
-            anchor_name = anchor_name.replace('_', '-')
-            anchor_name = re.sub(r'P\d+$', '', anchor_name)
+            anchor_name = _footnote_anchor(prev['name'])
             sorted_anchor_list.append(anchor_name)
             anchor_to_p[anchor_name] = p
     notes_by_anchor = {}
     for anchor, p in anchor_to_p.items():
-        for a in p.find_all('a', href=True):
-            obsidian_link, _ = convert_to_obsidian_link(a, current_book, all_refs)
-            a.replace_with(obsidian_link)
-        for b in p.find_all("b"):
-            b.replace_with(f"**{b.get_text()}**")
-        for u in p.find_all("u"):
-            u.replace_with(u.get_text())
-        for s in p.find_all("s"):
-            s.replace_with(s.get_text())
-        text = p.get_text().replace("\xa0", " ").strip()
-        text = text.rstrip() + f" ^{anchor}"
-        text = re.sub(r'\n\s+', '\n', text)
-        notes_by_anchor[anchor] = text
-    output = []
-    for anchor in sorted_anchor_list:
-        output.append(notes_by_anchor[anchor])
-
-    def fix_line(s: str) -> str:
-        # If it starts with "[ **par.**" and ends with "]", wrap ends with escaped brackets
-        return (r"\[" + s[1:-1] + r"\]") if s.startswith("[ **par.**") and s.endswith("]") else s
-
-    output = [
-        "\n".join(fix_line(line) for line in chunk.splitlines())
-        for chunk in output
-    ]
-    return "\n\n".join(output)
+        links = []
+        tags = p.find_all('a', href=True)
+        for a in tags:
+            a.replace_with(LINK_PLACEHOLDER.format(len(links)))
+            links.append(extract_link(a))
+        free_trees(tags)
+        replace_tags(p, "b", lambda b: f"**{b.get_text()}**")
+        replace_tags(p, "u", lambda u: u.get_text())
+        replace_tags(p, "s", lambda s: s.get_text())
+        notes_by_anchor[anchor] = Footnote(anchor, p.get_text(), links)
+    notes = [notes_by_anchor[anchor] for anchor in sorted_anchor_list]
+    free_tree(soup)
+    return all_refs, notes
 
-def parse_outline(html_file: str, current_book: str) -> str:
-    """Parse outline HTML to markdown."""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    soup = BeautifulSoup(html_content, 'html.parser')
-    for tag in soup(['head', 'h3', 'pre']):
-        tag.decompose()
-    outline_lines = []
-    for tag in soup.find_all(['kbd', 'em', 'h6', 'dfn', 'big', 'samp']):
+def parse_footnotes(html_file: str, current_book: str, all_refs: dict) -> str:
+    """Parse footnotes HTML to markdown."""
+    _, notes = load_footnotes(html_file)
+    return render_footnotes(notes, current_book, all_refs)
+
+def extract_outline(html_file: str, current_book: str, html_content: str = None) -> list:
+    """Extract the OutlinePoints of an outline HTML file (html_content if it was read already)."""
+    if html_content is None:
+        html_content = read_html(html_file)
+    soup = make_soup(html_content)
+    html_content = None
+    tags = soup(['head', 'h3', 'pre'])
+    for tag in tags:
+        tag.extract()
+    free_trees(tags)
+    points = []
+    for tag in soup.find_all(OUTLINE_TAGS):
         label = ''
         label_tag = tag.find('a', href=True)
         if label_tag:
@@ -127,57 +189,102 @@ def parse_outline(html_file: str, current_book: str) -> str:
             if u_tag:
                 main_text = u_tag.get_text().strip()
 
-        verse_range = extract_verse_spec(tag, current_book)
-        label_str = f"{label}" if label else ''
-        main = f"{main_text}".strip()
-        if verse_range:
-            main += f" ({verse_range})"
-        outline_link = f"[[{current_book}#^o{anchor[1:]}|{label_str}]]" if anchor else label_str
-        line = f"{outline_link} {main}"
-        outline_lines.append(line)
+        points.append(OutlinePoint(anchor, label, main_text, extract_verse_spec(tag, current_book)))
+    free_tree(soup)
+    return points
+
+def parse_outline(html_file: str, current_book: str) -> str:
+    """Parse outline HTML to markdown."""
+    return render_outline(extract_outline(html_file, current_book), current_book)
+
 
-    outline_lines = map_outline_lines(outline_lines, current_book, output_line_separator="\n\n")
-    book_heading = f"# {BOOK_ABBR_REVERSE.get(current_book, current_book)} Outline\n"
-    return book_heading + "\n\n" + outline_lines + "\n"
+# Verse headers: <b><a href="a.htm">Gen</a> <a href="#v1">1</a>:<a href="#v1_2">2</a></b>,
+# in one-chapter books <b><a href="a.htm">Jude</a> <a href="#v1_2">2</a></b>
+_BIBLE_HREF_RE = re.compile(r'a\.htm(?:#|$)')
+_VERSE_LABEL_RE = re.compile(r'\d+[a-z]?|Title')
+# Marks put around the verse headers in the soup, so that the text can be cut into
+# verses after get_text(): VERSE_MARK.format(index of the header) before, HEADER_END after
+_VERSE_MARK = "\x01{}\x02"
+_VERSE_MARK_RE = re.compile(r'\x01(\d+)\x02')
+_HEADER_END = "\x03"
 
+def _verse_reference(b):
+    """The (chapter, verse) of a verse header <b> tag, chapter None in one-chapter books, or None for other tags."""
+    links = b.find_all('a', href=True)
+    if len(links) not in (2, 3) or not _BIBLE_HREF_RE.match(links[0]['href']):
+        return None
+    numbers = [a.get_text().strip() for a in links[1:]]
+    chapter, verse = numbers if len(numbers) == 2 else (None, numbers[0])
+    if (chapter is not None and not chapter.isdigit()) or not _VERSE_LABEL_RE.fullmatch(verse):
+        return None
+    return chapter, verse
 
+def _text_blocks(text: str, references: list) -> list:
+    """Cut the marked text of a book into Passages and Verses (a verse is its header and the rest of its line)."""
+    parts = _VERSE_MARK_RE.split(text)
+    blocks = [Passage(parts[0])] if parts[0] else []
+    for index, part in zip(parts[1::2], parts[2::2]):
+        header, _, rest = part.partition(_HEADER_END)
+        verse_text, newline, after = rest.partition("\n")
+        blocks.append(Verse(*references[int(index)], header, verse_text))
+        if newline:
+            blocks.append(Passage(newline + after))
+    return blocks
 
-def parse_text(html, current_book, all_refs):
+def extract_text(html, current_book, html_content: str = None) -> BookText:
     """
-    Parse Bible HTML text to Obsidian/Raycast markdown, extracting front matter and cleaning up formatting.
+    Extract the verses and the text between them of a Bible HTML text file, with their
+    links as placeholders, and its property table.
+    html_content is the contents of the file if it was read already.
     """
-    with open(html, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+    if html_content is None:
+        html_content = read_html(html)
     clean_html = re.sub(r'\s+', ' ', html_content).strip()
-    soup = BeautifulSoup(clean_html, 'html.parser')
+    # Only the soup is needed from here on; dropping the source strings keeps them out of the peak
+    html_content = None
+    soup = make_soup(clean_html)
+    clean_html = None
+    references = []
+    for b in soup.find_all("b"):
+        reference = _verse_reference(b)
+        if reference:
+            b.insert_before(_VERSE_MARK.format(len(references)))
+            b.insert_after(_HEADER_END)
+            references.append(reference)
 
     # Tag replacements
     # replace italic with _text_ but leave in surrounding tags for further processing
     replace_tags(soup, "i", lambda i: f"_{i.get_text()}_")
     replace_tags(soup, "s", lambda s: "")
-    replace_tags(soup, "a", lambda a: convert_to_obsidian_link(a, current_book, all_refs)[0])
+    links = []
+    def link_placeholder(a):
+        links.append(extract_link(a))
+        return LINK_PLACEHOLDER.format(len(links) - 1)
+    replace_tags(soup, "a", link_placeholder)
     replace_tags(soup, "b", lambda b: f"**{b.get_text()}**")
     replace_tags(soup, "q", lambda q: f"\n   {q.get_text()}\n")
 
-    front_matter, properties = extract_properties(soup)
+    properties = extract_property_pairs(soup)
     insert_newlines_before_br(soup)
+    text = soup.get_text()
+    free_tree(soup)
+    return BookText(_text_blocks(text, references), links, properties)
 
-    text = soup.get_text().strip().replace("\xa0", " ")
-    text = cleanup_markdown(text, current_book)
-    text = merge_multiline_chapter_links(text)
-    text = add_chapter_anchors(text, current_book)
-    text = replace_bible_links(text, current_book)
-    text = remove_unwanted_lines_and_separate_verse_outline(text, current_book)
-    text = map_outline_lines(text, current_book)
-    text = outline_with_spacing(text, current_book)
-    text = combine_split_verses(text)
-    text = add_verse_anchors(text)
-    text = combine_nav_and_verse_lines(text)
-
-
-    front_matter, text, properties = update_front_matter_with_subject(text, front_matter, properties)
-    text = merge_top_chapters_line(text)
-    text = re.sub(r'\n{3,}', '\n\n', text) # Remove double new lines
-    text = ensure_empty_line_before_dashes(text)
-    text = insert_frontmatter_and_final_cleanup(text, front_matter, current_book, properties)
-    return text
\ No newline at end of file
+def parse_text(html, current_book, all_refs):
+    """
+    Parse Bible HTML text to Obsidian/Raycast markdown, extracting front matter and cleaning up formatting.
+    """
+    return render_text(extract_text(html, current_book), current_book, all_refs)
+
+def extract_book(text_file: str, footnotes, outline_file: str, current_book: str, contents: dict = None) -> BookIR:
+    """
+    Extract the IR of a book. footnotes are the notes from load_footnotes, or the
+    footnotes file if it was not parsed yet. contents maps the files that were read
+    already (see pipeline.read_ahead) to their contents; they are taken out of it as
+    they are parsed, so that only one file's HTML is held at a time.
+    """
+    contents = contents if contents is not None else {}
+    if isinstance(footnotes, str):
+        footnotes = load_footnotes(footnotes, contents.pop(footnotes, None))[1]
+    text = extract_text(text_file, current_book, contents.pop(text_file, None))
+    return BookIR(current_book, text, footnotes, extract_outline(outline_file, current_book, contents.pop(outline_file, None)))
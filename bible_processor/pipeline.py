@@ -0,0 +1,122 @@
+"""
+Read-ahead and write-behind stages that overlap file I/O with the conversion.
+
+read_ahead() reads the inputs of the next books in a background thread while the
+current book is converted, and WriteBehind writes the finished notes in another
+one. Both hand items over through bounded queues, so at most depth books (or files)
+are held in memory on either side, however many books are converted. Threads are
+enough here: file reads and writes release the GIL, and the conversion itself stays
+in the main thread (or in the pool workers with --jobs).
+"""
+import queue
+import threading
+
+# Books read ahead of the conversion, and files per book written behind it, by default
+IO_DEPTH = 2
+
+_DONE = object()
+
+
+class _Failure:
+    """An exception raised in a stage thread, re-raised in the main thread."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(items: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put item on the bounded queue unless stop is set while waiting; returns whether it was put."""
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def read_ahead(tasks, read, depth: int = IO_DEPTH):
+    """
+    Yield (key, args, read(*args)) for the (key, args) items of tasks, with up to depth
+    items read ahead in a background thread. With depth 0, items are read in turn.
+    """
+    if depth <= 0:
+        for key, args in tasks:
+            yield key, args, read(*args)
+        return
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for key, args in tasks:
+                if not _put(items, (key, args, read(*args)), stop):
+                    return
+            _put(items, _DONE, stop)
+        except BaseException as error:
+            _put(items, _Failure(error), stop)
+
+    thread = threading.Thread(target=produce, name="read-ahead", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class WriteBehind:
+    """
+    Passes writes on to an OutputWriter in a background thread, at most depth files
+    behind. close() waits for the pending writes and re-raises the first error.
+    """
+
+    def __init__(self, writer, depth: int = 3 * IO_DEPTH):
+        self.writer = writer
+        self._error = None
+        self._items = queue.Queue(maxsize=depth) if depth > 0 else None
+        self._thread = None
+        if self._items is not None:
+            self._thread = threading.Thread(target=self._consume, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _consume(self):
+        while True:
+            item = self._items.get()
+            if item is _DONE:
+                return
+            if self._error is None:
+                try:
+                    self.writer.write(*item)
+                except BaseException as error:
+                    self._error = error
+
+    def write(self, path: str, content: str):
+        """Queue content to be written to path (written right away with depth 0)."""
+        if self._error is not None:
+            raise self._error
+        if self._items is None:
+            self.writer.write(path, content)
+        else:
+            self._items.put((path, content))
+
+    def close(self, raise_errors: bool = True):
+        """Wait for the queued writes to finish."""
+        if self._thread is not None:
+            self._items.put(_DONE)
+            self._thread.join()
+            self._thread = None
+        if raise_errors and self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # An error of the conversion takes precedence over one of the writes
+        self.close(raise_errors=exc_type is None)
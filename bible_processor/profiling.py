@@ -0,0 +1,278 @@
+"""
+Opt-in per-stage timing of the conversion pipeline.
+
+install() wraps every function of parsers.py, render.py and utils.py with a timer.
+Nothing is wrapped unless profiling is enabled, so a normal run pays no overhead.
+Stages are recorded per book (see book()) with their call count, inclusive and self
+wall time and input/output size. The report also counts the links converted (and the
+hits and misses of the link conversion cache), footnotes emitted and outline lines
+mapped.
+
+With memory, tracemalloc also records the peak and net allocation of every book and
+stage (peak_bytes: the most allocated at once above what was allocated when it
+started, net_bytes: what it left allocated). Tracing slows the run down severalfold,
+so memory is opt-in on top of profiling.
+"""
+import contextlib
+import cProfile
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from . import inputs
+
+# The active StageProfiler, or None if profiling is off
+ACTIVE = None
+
+# Pipeline functions whose calls are counted, and how much each call adds
+COUNTERS = {
+    "obsidian_link": ("links_converted", lambda args, result: 1),
+    "render_footnotes": ("footnotes_emitted", lambda args, result: len(args[0])),
+    "map_outline_line": ("outline_lines_mapped", lambda args, result: 1),
+}
+
+
+def _size(value, depth: int = 0) -> int:
+    """Approximate size in characters of a stage input or output (file paths count as the file size)."""
+    if isinstance(value, str):
+        if value.endswith(".htm") and inputs.exists(value):
+            return inputs.getsize(value)
+        return len(value)
+    if depth < 2 and isinstance(value, (list, tuple)):
+        return sum(_size(item, depth + 1) for item in value)
+    return 0
+
+
+class _Counted:
+    """Iterator that counts the characters of the lines pulled through it."""
+
+    def __init__(self, lines, stats: dict):
+        self._lines = iter(lines)
+        self._stats = stats
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        self._stats["in_size"] += len(line) if isinstance(line, str) else 0
+        return line
+
+
+class StageProfiler:
+    """Collects stage statistics per book, optionally with a cProfile dump per book."""
+
+    def __init__(self, cprofile_dir: str = None, memory: bool = False):
+        self.cprofile_dir = cprofile_dir
+        self.memory = memory
+        self.books = {}
+        self._book = None
+        self._stack = []
+        # Per open book or stage, the highest allocation seen before its inner stages reset the tracemalloc peak
+        self._peaks = []
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _book_stats(self) -> dict:
+        return self.books.setdefault(self._book or "-", {"wall_s": 0.0, "stages": {}, "counters": {}})
+
+    def _stage_stats(self, stage: str) -> dict:
+        return self._book_stats()["stages"].setdefault(stage, {"calls": 0, "wall_s": 0.0, "self_s": 0.0, "in_size": 0, "out_size": 0})
+
+    @contextlib.contextmanager
+    def book(self, name: str, phase: str = ""):
+        """Attribute all stages run inside the block to the given book."""
+        from .utils import link_cache_info
+        previous, self._book = self._book, name
+        links_before = link_cache_info()
+        profile = cProfile.Profile() if self.cprofile_dir else None
+        memory_start = self._memory_enter() if self.memory else None
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profile.dump_stats(os.path.join(self.cprofile_dir, f"{name}{'-' + phase if phase else ''}.prof"))
+            book_stats = self._book_stats()
+            book_stats["wall_s"] += time.perf_counter() - start
+            if self.memory:
+                self._memory_exit(book_stats, memory_start)
+            links_after = link_cache_info()
+            for counter, before, after in (("link_cache_hits", links_before.hits, links_after.hits),
+                                           ("link_cache_misses", links_before.misses, links_after.misses)):
+                if after > before:
+                    book_stats["counters"][counter] = book_stats["counters"].get(counter, 0) + after - before
+            self._book = previous
+
+    def _enter(self):
+        self._stack.append(0.0)
+        return time.perf_counter()
+
+    def _exit(self, stage: str, start: float):
+        elapsed = time.perf_counter() - start
+        children = self._stack.pop()
+        if self._stack:
+            self._stack[-1] += elapsed
+        stats = self._stage_stats(stage)
+        stats["wall_s"] += elapsed
+        stats["self_s"] += elapsed - children
+        return stats
+
+    def _memory_enter(self) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        tracemalloc.reset_peak()
+        self._peaks.append(current)
+        return current
+
+    def _memory_exit(self, stats: dict, start: int):
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, self._peaks.pop())
+        stats["peak_bytes"] = max(stats.get("peak_bytes", 0), peak - start)
+        stats["net_bytes"] = stats.get("net_bytes", 0) + current - start
+
+    def _count(self, name: str, args, result):
+        if name in COUNTERS:
+            counter, amount = COUNTERS[name]
+            counters = self._book_stats()["counters"]
+            counters[counter] = counters.get(counter, 0) + amount(args, result)
+
+    def wrap(self, stage: str, func):
+        """Return func timed as the given stage."""
+        name = func.__name__
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                stats = self._stage_stats(stage)
+                stats["calls"] += 1
+                if args and isinstance(args[0], (str, list, tuple)):
+                    stats["in_size"] += _size(args[0])
+                elif args:
+                    args = (_Counted(args[0], stats),) + args[1:]
+                iterator = func(*args, **kwargs)
+                while True:
+                    start = self._enter()
+                    try:
+                        line = next(iterator)
+                    except StopIteration:
+                        self._exit(stage, start)
+                        return
+                    except BaseException:
+                        self._exit(stage, start)
+                        raise
+                    self._exit(stage, start)["out_size"] += _size(line)
+                    yield line
+            return wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Reads ahead in the pipeline threads (see pipeline.py) overlap the stages and are not timed
+            if threading.current_thread() is not threading.main_thread():
+                return func(*args, **kwargs)
+            memory_start = self._memory_enter() if self.memory else None
+            start = self._enter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                stats = self._exit(stage, start)
+                if self.memory:
+                    self._memory_exit(stats, memory_start)
+            stats["calls"] += 1
+            stats["in_size"] += _size(args)
+            stats["out_size"] += _size(result)
+            self._count(name, args, result)
+            return result
+        return wrapper
+
+    def collect(self) -> dict:
+        """Return and reset the statistics gathered so far (used to ship them out of pool workers)."""
+        books, self.books = self.books, {}
+        return books
+
+    def reset(self):
+        """Forget everything gathered so far, e.g. what a forked pool worker inherited from its parent."""
+        self.books = {}
+        self._book = None
+        self._stack = []
+        self._peaks = []
+
+    def merge(self, books: dict):
+        """Add statistics collected by another profiler, e.g. in a pool worker."""
+        for name, data in books.items():
+            target = self.books.setdefault(name, {"wall_s": 0.0, "stages": {}, "counters": {}})
+            target["wall_s"] += data["wall_s"]
+            _merge_memory(target, data)
+            for stage, stats in data["stages"].items():
+                total = target["stages"].setdefault(stage, dict.fromkeys(stats, 0))
+                for key, value in stats.items():
+                    total[key] = max(total.get(key, 0), value) if key == "peak_bytes" else total.get(key, 0) + value
+            for counter, value in data["counters"].items():
+                target["counters"][counter] = target["counters"].get(counter, 0) + value
+
+    def report(self) -> dict:
+        """Per-book and total statistics, stages sorted by self time."""
+        totals = StageProfiler()
+        for data in self.books.values():
+            totals.merge({"total": data})
+        def ordered(data):
+            return {
+                "wall_s": data["wall_s"],
+                **{key: data[key] for key in ("peak_bytes", "net_bytes") if key in data},
+                "counters": data["counters"],
+                "stages": dict(sorted(data["stages"].items(), key=lambda item: item[1]["self_s"], reverse=True)),
+            }
+        return {
+            "books": {name: ordered(data) for name, data in sorted(self.books.items())},
+            "total": ordered(totals.books.get("total", {"wall_s": 0.0, "stages": {}, "counters": {}})),
+        }
+
+    def write_report(self, path: str):
+        """Write report() as JSON."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=1)
+
+
+def _merge_memory(target: dict, data: dict):
+    """Add the memory statistics of a book: the highest peak and the sum of the net allocations."""
+    if "peak_bytes" in data:
+        target["peak_bytes"] = max(target.get("peak_bytes", 0), data["peak_bytes"])
+        target["net_bytes"] = target.get("net_bytes", 0) + data["net_bytes"]
+
+
+def install(cprofile_dir: str = None, memory: bool = False) -> StageProfiler:
+    """Enable profiling: wrap the functions of parsers.py, render.py and utils.py wherever the package references them."""
+    global ACTIVE
+    from . import parsers, render, utils
+    if ACTIVE is not None:
+        return ACTIVE
+    ACTIVE = StageProfiler(cprofile_dir, memory)
+    originals = {}
+    for module in (utils, parsers, render):
+        for name, func in vars(module).items():
+            if inspect.isfunction(func) and func.__module__ == module.__name__:
+                originals[func] = ACTIVE.wrap(f"{module.__name__.rsplit('.', 1)[-1]}.{name}", func)
+    package = __name__.rsplit(".", 1)[0]
+    for module in list(sys.modules.values()):
+        # Match on the spec name so that the package's main module is found when run with -m
+        module_name = getattr(getattr(module, "__spec__", None), "name", "") or ""
+        if not (module_name == package or module_name.startswith(package + ".")):
+            continue
+        for name, value in list(vars(module).items()):
+            if inspect.isfunction(value) and value in originals:
+                setattr(module, name, originals[value])
+    return ACTIVE
+
+def book(name: str, phase: str = ""):
+    """Attribute the stages run in the block to a book, if profiling is on."""
+    return ACTIVE.book(name, phase) if ACTIVE is not None else contextlib.nullcontext()
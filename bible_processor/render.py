@@ -0,0 +1,189 @@
+"""
+Rendering of the IR (see ir.py) to output files, without BeautifulSoup.
+
+RENDER_TARGETS maps the name of every output format to a function turning a BookIR
+into {relative path: content}; "obsidian" is the vault the converter always writes,
+other targets can be rendered from the same IR in the same pass.
+"""
+import re
+from typing import Any, Dict
+
+from bs4.dammit import EntitySubstitution
+
+from .blocks import iter_links
+from .constants import BOOK_ABBR_REVERSE
+from .utils import (
+    _LINK_PLACEHOLDER_RE,
+    add_chapter_anchors,
+    cleanup_markdown,
+    ensure_empty_line_before_dashes,
+    insert_frontmatter_and_final_cleanup,
+    iter_add_verse_anchors,
+    iter_combine_nav_and_verse_lines,
+    iter_combine_split_verses,
+    iter_lines,
+    iter_map_outline_lines,
+    iter_outline_with_spacing,
+    iter_remove_unwanted_lines_and_separate_verse_outline,
+    map_outline_line,
+    map_outline_lines,
+    merge_multiline_chapter_links,
+    merge_top_chapters_line,
+    obsidian_link,
+    properties_front_matter,
+    remove_obsidian_links,
+    replace_bible_links,
+    resolve_link_placeholders,
+    update_front_matter_with_subject,
+)
+
+
+def render_text(book_text, current_book: str, all_refs: Dict[str, Any], links: list = None) -> str:
+    """
+    Render the BookText of a book to markdown. With links, the (note, block ID, target
+    note, target block ID) of every link in a verse is appended to it.
+    """
+    targets = {} if links is not None else None
+    text = resolve_link_placeholders(book_text.text, book_text.links, current_book, all_refs, targets)
+    if links is not None:
+        for verse in book_text.verses():
+            links.extend((current_book, verse.block, *targets[int(index)]) for index in _LINK_PLACEHOLDER_RE.findall(verse.text))
+    # Property values are HTML, so their links are escaped like the soup escaped them
+    pairs = [
+        (key, _LINK_PLACEHOLDER_RE.sub(
+            lambda m: EntitySubstitution.substitute_xml(obsidian_link(*book_text.links[int(m.group(1))], current_book, all_refs)[0]),
+            value))
+        for key, value in book_text.properties or []
+    ]
+    front_matter, properties = properties_front_matter(pairs)
+
+    text = text.strip().replace("\xa0", " ")
+    text = cleanup_markdown(text, current_book)
+    text = merge_multiline_chapter_links(text)
+    # The chapter and link rewrites may match across line breaks, so they run on the whole text
+    text = add_chapter_anchors(text, current_book)
+    text = replace_bible_links(text, current_book)
+    # The line stages are chained as generators, passing lines on without joining the text in between
+    lines = iter_remove_unwanted_lines_and_separate_verse_outline(text.splitlines(), current_book)
+    lines = iter_map_outline_lines(iter_lines(lines), current_book)
+    lines = iter_outline_with_spacing(iter_lines(lines), current_book)
+    lines = iter_combine_split_verses(iter_lines(lines))
+    lines = iter_add_verse_anchors(iter_lines(lines))
+    lines = iter_combine_nav_and_verse_lines(iter_lines(lines))
+    text = "\n".join(lines)
+
+
+    front_matter, text, properties = update_front_matter_with_subject(text, front_matter, properties)
+    text = merge_top_chapters_line(text)
+    text = re.sub(r'\n{3,}', '\n\n', text) # Remove double new lines
+    text = ensure_empty_line_before_dashes(text)
+    text = insert_frontmatter_and_final_cleanup(text, front_matter, current_book, properties)
+    return text
+
+def render_footnotes(notes: list, current_book: str, all_refs: dict, links: list = None) -> str:
+    """
+    Render notes from load_footnotes to markdown. With links, the (note, block ID,
+    target note, target block ID) of every link in a footnote is appended to it.
+    """
+    output = []
+    for anchor, text, note_links in notes:
+        targets = {} if links is not None else None
+        text = resolve_link_placeholders(text, note_links, current_book, all_refs, targets)
+        if links is not None:
+            links.extend((f"{current_book}N", anchor, *target) for target in targets.values())
+        text = text.replace("\xa0", " ").strip()
+        text = text.rstrip() + f" ^{anchor}"
+        text = re.sub(r'\n\s+', '\n', text)
+        output.append(text)
+
+    def fix_line(s: str) -> str:
+        # If it starts with "[ **par.**" and ends with "]", wrap ends with escaped brackets
+        return (r"\[" + s[1:-1] + r"\]") if s.startswith("[ **par.**") and s.endswith("]") else s
+
+    output = [
+        "\n".join(fix_line(line) for line in chunk.splitlines())
+        for chunk in output
+    ]
+    return "\n\n".join(output)
+
+def outline_line(point, current_book: str) -> str:
+    """The line of an OutlinePoint before map_outline_lines turns it into a heading."""
+    label_str = f"{point.label}" if point.label else ''
+    main = f"{point.text}".strip()
+    if point.verses:
+        main += f" ({point.verses})"
+    outline_link = f"[[{current_book}#^o{point.anchor[1:]}|{label_str}]]" if point.anchor else label_str
+    return f"{outline_link} {main}"
+
+def outline_levels(points: list, current_book: str) -> list:
+    """The heading level of every OutlinePoint, as render_outline gives it (0 for points that are no heading)."""
+    levels = []
+    previous_rom, previous_arabic = None, None
+    for point in points:
+        heading, previous_rom, previous_arabic = map_outline_line(outline_line(point, current_book).strip(), current_book, previous_rom, previous_arabic)
+        levels.append(len(heading) - len(heading.lstrip("#")))
+    return levels
+
+def outline_links(points: list, current_book: str):
+    """Yield the (note, block ID, target note, target block ID) of the block links of OutlinePoints, which are stored resolved."""
+    for point in points:
+        if not point.anchor:
+            continue
+        for note, anchor, _ in iter_links(f"{point.text} {point.verses or ''}"):
+            if anchor.startswith("^"):
+                yield f"{current_book}O", f"o{point.anchor[1:]}", note or current_book, anchor[1:]
+
+def render_outline(points: list, current_book: str) -> str:
+    """Render the OutlinePoints of a book to markdown."""
+    outline_lines = map_outline_lines([outline_line(point, current_book) for point in points], current_book, output_line_separator="\n\n")
+    book_heading = f"# {BOOK_ABBR_REVERSE.get(current_book, current_book)} Outline\n"
+    return book_heading + "\n\n" + outline_lines + "\n"
+
+
+def render_obsidian(ir, all_refs: Dict[str, Any], links: list = None) -> dict:
+    """
+    The Text, Footnotes and Outlines notes of a book. With links, the (note, block ID,
+    target note, target block ID) of every link from a verse, footnote or outline point
+    is appended to it, as the links are resolved; the target block ID is None for links
+    to a whole note.
+    """
+    files = {
+        f"Text/{ir.book}.md": render_text(ir.text, ir.book, all_refs, links),
+        f"Footnotes/{ir.book}N.md": render_footnotes(ir.footnotes, ir.book, all_refs, links),
+        f"Outlines/{ir.book}O.md": render_outline(ir.outline, ir.book),
+    }
+    if links is not None:
+        links.extend(outline_links(ir.outline, ir.book))
+    return files
+
+def _plain(text: str, links: list) -> str:
+    """Text with its link placeholders replaced by the link texts and markdown emphasis removed."""
+    text = _LINK_PLACEHOLDER_RE.sub(lambda m: links[int(m.group(1))][2], text)
+    text = re.sub(r'\*\*|(?<!\w)_|_(?!\w)', '', text.replace("\xa0", " "))
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+def render_plain(ir, all_refs: Dict[str, Any]) -> dict:
+    """Plain text of a book's text, footnotes and outline, e.g. for grep or text tools."""
+    notes = "\n\n".join(f"{note.anchor}\n{_plain(note.text, note.links)}" for note in ir.footnotes)
+    levels = outline_levels(ir.outline, ir.book)
+    outline = "\n".join(f"{'  ' * max(level - 2, 0)}{point.label} {remove_obsidian_links(point.text)}".rstrip() for point, level in zip(ir.outline, levels))
+    return {
+        f"Plain/{ir.book}.txt": _plain(ir.text.text, ir.text.links) + "\n",
+        f"Plain/{ir.book}N.txt": notes + "\n",
+        f"Plain/{ir.book}O.txt": outline + "\n",
+    }
+
+RENDER_TARGETS = {
+    "obsidian": render_obsidian,
+    "plain": render_plain,
+}
+
+def render_book(ir, all_refs: Dict[str, Any], targets: list = ("obsidian",), links: list = None) -> dict:
+    """
+    Render a BookIR to all targets; returns {relative path: content}. With links, the
+    links of the Obsidian notes are appended to it (see render_obsidian).
+    """
+    files = {}
+    for target in targets:
+        files.update(render_obsidian(ir, all_refs, links) if target == "obsidian" else RENDER_TARGETS[target](ir, all_refs))
+    return files
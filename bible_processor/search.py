@@ -0,0 +1,332 @@
+"""
+Full-text index of the verses and footnotes, and the search subcommand.
+
+The conversion writes one index segment per book to .bible_processor/search/, so a
+run that converts some books only rewrites their segments. The indexed text is the
+text of each verse and footnote as extracted (see ir.py), before any link markup is
+added: links are replaced by their texts as rendered, and the reference in front of
+a footnote (1:11) and the emphasis are removed. Terms are lowercased words.
+
+A segment stores its documents (note and block ID), its sorted terms, and for every
+term the documents and word positions it occurs at as delta-encoded varints, plus
+the zlib-compressed document texts for the results. Loading one is a handful of
+C-level splits, so a query over all books takes milliseconds.
+
+Queries combine terms, "quoted phrases" and prefix* terms with AND (the default
+between terms), OR, NOT or -term, and parentheses:
+
+    python -m bible_processor.main search '"in the beginning" (god OR lord) -earth' [vault_folder]
+"""
+import bisect
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from array import array
+
+from .blocks import book_order
+from .split import vault_link
+from .utils import _LINK_PLACEHOLDER_RE, replace_jubilee_abbreviations
+
+SEARCH_DIR = os.path.join(".bible_processor", "search")
+SEGMENT_SUFFIX = ".idx"
+_MAGIC = b"BPSI\x01"
+# Lengths of the meta, documents, terms, term offsets, postings and texts sections
+_HEADER = struct.Struct("<6I")
+
+TOKEN_RE = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+# The bold reference in front of a note, and emphasis
+_REFERENCE_RE = re.compile(r'^\s*\*\*[^*]*\*\*')
+_EMPHASIS_RE = re.compile(r'\*\*|(?<!\w)_|_(?!\w)')
+
+
+def _link_text(link: tuple) -> str:
+    """The display text of an (href, name, text) link, as utils.obsidian_link renders it."""
+    return replace_jubilee_abbreviations(link[2]) or "*"
+
+def clean_text(text: str, links: list) -> str:
+    """The plain text of the IR text of a verse or footnote, whose link placeholders refer to links."""
+    text = _LINK_PLACEHOLDER_RE.sub(lambda m: _link_text(links[int(m.group(1))]), text)
+    text = _EMPHASIS_RE.sub("", _REFERENCE_RE.sub("", text))
+    return " ".join(text.split())
+
+def tokenize(text: str) -> list:
+    """The terms of text, in order."""
+    return [match.group().lower().replace("’", "'") for match in TOKEN_RE.finditer(text)]
+
+def book_documents(ir):
+    """
+    Yield the (note, block ID, plain text) of every verse and footnote of a BookIR;
+    the halves of a split verse (5a, 5b) are one document, like their block.
+    """
+    verses = {}
+    for verse in ir.text.verses():
+        verses.setdefault(verse.block, []).append(clean_text(verse.text, ir.text.links))
+    for block, texts in verses.items():
+        yield ir.book, block, " ".join(texts)
+    for note in ir.footnotes:
+        yield f"{ir.book}N", note.anchor, clean_text(note.text, note.links)
+
+
+def _varints(numbers) -> bytearray:
+    out = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            out.append((number & 0x7F) | 0x80)
+            number >>= 7
+        out.append(number)
+    return out
+
+def _read_varints(data: bytes, start: int, end: int) -> list:
+    numbers, number, shift = [], 0, 0
+    for i in range(start, end):
+        byte = data[i]
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number, shift = 0, 0
+    return numbers
+
+
+def build_segment(book: str, documents) -> bytes:
+    """The index segment of a book's (note, block ID, text) documents."""
+    docs, texts, postings = [], [], {}
+    for doc, (note, anchor, text) in enumerate(documents):
+        docs.append(f"{note}\t{anchor}")
+        texts.append(text)
+        for position, term in enumerate(tokenize(text)):
+            positions = postings.setdefault(term, {}).setdefault(doc, [])
+            positions.append(position)
+    terms = sorted(postings)
+    offsets, blob = array("I", [0]), bytearray()
+    for term in terms:
+        # Per term: document count, then per document the doc delta, position count and position deltas
+        numbers, previous_doc = [len(postings[term])], 0
+        for doc, positions in postings[term].items():
+            numbers += [doc - previous_doc, len(positions)]
+            numbers += [position - previous for position, previous in zip(positions, [0] + positions)]
+            previous_doc = doc
+        blob += _varints(numbers)
+        offsets.append(len(blob))
+    sections = [
+        json.dumps({"book": book}).encode("utf-8"),
+        "\n".join(docs).encode("utf-8"),
+        "\n".join(terms).encode("utf-8"),
+        offsets.tobytes(),
+        bytes(blob),
+        zlib.compress("\0".join(texts).encode("utf-8")),
+    ]
+    return _MAGIC + _HEADER.pack(*(len(section) for section in sections)) + b"".join(sections)
+
+def segment_path(output_dir: str, book: str) -> str:
+    return os.path.join(output_dir, SEARCH_DIR, f"{book}{SEGMENT_SUFFIX}")
+
+def save_segment(output_dir: str, book: str, documents):
+    """Index the (note, block ID, text) documents of a book (see book_documents), replacing its previous segment."""
+    path = segment_path(output_dir, book)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(build_segment(book, documents))
+    os.replace(tmp_path, path)
+
+def has_segment(output_dir: str, book: str) -> bool:
+    """True if the book has a segment of the current format."""
+    try:
+        with open(segment_path(output_dir, book), "rb") as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    except OSError:
+        return False
+
+
+class Segment:
+    """A loaded index segment."""
+
+    def __init__(self, data: bytes):
+        if not data.startswith(_MAGIC):
+            raise ValueError("not a search index segment of this version")
+        lengths = _HEADER.unpack_from(data, len(_MAGIC))
+        start, sections = len(_MAGIC) + _HEADER.size, []
+        for length in lengths:
+            sections.append(data[start:start + length])
+            start += length
+        meta, docs, terms, offsets, self._postings, self._texts = sections
+        self.book = json.loads(meta)["book"]
+        self.docs = [tuple(doc.split("\t")) for doc in docs.decode("utf-8").split("\n")] if docs else []
+        self.terms = terms.decode("utf-8").split("\n") if terms else []
+        self._offsets = array("I")
+        self._offsets.frombytes(offsets)
+        self._text_list = None
+
+    def postings(self, term: str) -> dict:
+        """{document: [positions]} of a term."""
+        i = bisect.bisect_left(self.terms, term)
+        if i == len(self.terms) or self.terms[i] != term:
+            return {}
+        numbers = _read_varints(self._postings, self._offsets[i], self._offsets[i + 1])
+        result, doc, k = {}, 0, 1
+        for _ in range(numbers[0]):
+            doc += numbers[k]
+            count = numbers[k + 1]
+            positions, position = [], 0
+            for delta in numbers[k + 2:k + 2 + count]:
+                position += delta
+                positions.append(position)
+            result[doc] = positions
+            k += 2 + count
+        return result
+
+    def prefix_terms(self, prefix: str) -> list:
+        """The terms starting with prefix."""
+        i = bisect.bisect_left(self.terms, prefix)
+        j = bisect.bisect_left(self.terms, prefix + "\U0010ffff")
+        return self.terms[i:j]
+
+    def text(self, doc: int) -> str:
+        if self._text_list is None:
+            self._text_list = zlib.decompress(self._texts).decode("utf-8").split("\0")
+        return self._text_list[doc]
+
+def load_segments(output_dir: str) -> list:
+    """The segments of all books, in Bible order; segments of another format are skipped with a warning."""
+    directory = os.path.join(output_dir, SEARCH_DIR)
+    names = sorted((name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)),
+                   key=lambda name: book_order(name[:-len(SEGMENT_SUFFIX)])) if os.path.isdir(directory) else []
+    segments = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            data = f.read()
+        try:
+            segments.append(Segment(data))
+        except (ValueError, struct.error):
+            print(f"Warning: {name} is not a search index of this version, convert the book again to index it.")
+    return segments
+
+
+# Query syntax tree: ("term", t), ("prefix", p), ("phrase", [t, ...]), ("and"|"or", [nodes]), ("not", node)
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"?|(\()|(\))|(-)|([^\s()"]+)')
+
+def parse_query(query: str):
+    """Parse a query into a syntax tree; raises ValueError on a malformed query."""
+    tokens = []
+    for phrase, open_paren, close_paren, minus, word in _QUERY_TOKEN_RE.findall(query):
+        if open_paren or close_paren:
+            tokens.append(open_paren or close_paren)
+        elif minus:
+            tokens.append("NOT")
+        elif word in ("AND", "OR", "NOT"):
+            tokens.append(word)
+        elif word:
+            terms = tokenize(word)
+            if word.endswith("*") and len(terms) == 1:
+                tokens.append(("prefix", terms[0]))
+            elif terms:
+                tokens.append(("term", terms[0]) if len(terms) == 1 else ("phrase", terms))
+        else:
+            terms = tokenize(phrase)
+            if terms:
+                tokens.append(("term", terms[0]) if len(terms) == 1 else ("phrase", terms))
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        nodes = [parse_and()]
+        while peek() == "OR":
+            take()
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and():
+        nodes = [parse_unary()]
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                take()
+            nodes.append(parse_unary())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_unary():
+        token = take() if peek() is not None else None
+        if token == "NOT":
+            return ("not", parse_unary())
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("missing )")
+            take()
+            return node
+        if isinstance(token, tuple):
+            return token
+        raise ValueError(f"expected a term, got {token or 'the end of the query'}")
+
+    if not tokens:
+        raise ValueError("empty query")
+    tree = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"unexpected {tokens[position]}")
+    return tree
+
+def _phrase_docs(segment: Segment, terms: list) -> set:
+    """The documents in which terms occur one after another."""
+    postings = [segment.postings(term) for term in terms]
+    docs = set(postings[0]).intersection(*postings[1:])
+    matches = set()
+    for doc in docs:
+        starts = set(postings[0][doc])
+        for offset, term_postings in enumerate(postings[1:], 1):
+            starts &= {position - offset for position in term_postings[doc]}
+        if starts:
+            matches.add(doc)
+    return matches
+
+def evaluate(segment: Segment, node) -> set:
+    """The documents of a segment matching a query syntax tree."""
+    kind, value = node
+    if kind == "term":
+        return set(segment.postings(value))
+    if kind == "prefix":
+        return set().union(*(segment.postings(term) for term in segment.prefix_terms(value)))
+    if kind == "phrase":
+        return _phrase_docs(segment, value)
+    if kind == "not":
+        return set(range(len(segment.docs))) - evaluate(segment, value)
+    results = [evaluate(segment, child) for child in value]
+    return set.intersection(*results) if kind == "and" else set.union(*results)
+
+def search(output_dir: str, query: str, segments: list = None) -> list:
+    """The (note, block ID, text) of the verses and footnotes matching query, in Bible order."""
+    tree = parse_query(query)
+    results = []
+    for segment in segments if segments is not None else load_segments(output_dir):
+        for doc in sorted(evaluate(segment, tree)):
+            note, anchor = segment.docs[doc]
+            results.append((note, anchor, segment.text(doc)))
+    return results
+
+
+def main(argv: list = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="bible_processor.main search", description="Search the verses and footnotes of a converted vault.")
+    parser.add_argument("query", help='Terms, "phrases", prefix* terms, AND/OR/NOT (or -term) and parentheses')
+    parser.add_argument("vault_dir", nargs="?", default="Bible", help="Output directory of the conversion")
+    parser.add_argument("--limit", type=int, default=20, help="Number of results to print (0 = all)")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        results = search(args.vault_dir, args.query)
+    except ValueError as error:
+        parser.error(f"invalid query: {error}")
+    elapsed = time.perf_counter() - start
+    for note, anchor, text in results[:args.limit or None]:
+        print(f"[[{vault_link(args.vault_dir, note, anchor)}]] {text if len(text) <= 120 else text[:117] + '...'}")
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms.")
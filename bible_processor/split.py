@@ -0,0 +1,204 @@
+"""
+Per-chapter output (--split chapter): every chapter of a book's Text and Footnotes
+notes becomes a note of its own, so Obsidian never has to open, scroll or resolve
+block links in a whole book at once.
+
+    Text/Rom.md                  book note: properties, navigation, chapter list
+    Text/Rom/Rom 8.md            the outline points and verses of chapter 8
+    Footnotes/RomN.md            chapter list and the footnotes of no chapter (Titlex1)
+    Footnotes/RomN/RomN 8.md     the footnotes of the verses of chapter 8
+    Outlines/RomO.md             unchanged, one note per book
+
+The books are rendered as usual and split afterwards. Links to the verses and
+footnotes of a chapter are rewritten to its note ([[Rom#^8-2|...]] becomes
+[[Rom 8#^8-2|...]]) and links to a chapter anchor, like the chapter list and the
+previous/next navigation, to the chapter note itself ([[Rom 8|...]]); links to other
+blocks keep pointing at the book notes. The rewrite only needs the block ID of a
+link, so links to other books are rewritten without knowing how those are split.
+The search index, backlinks and SQLite export keep the book-note addresses.
+
+One-chapter books (Jude) are not split: their verses are block ^5, which would read
+as chapter anchors. They are the books of constants.ONE_CHAPTER_BOOKS, and any book
+whose Text note has no chapter-verse block ID (see is_one_chapter).
+"""
+import os
+import re
+
+from .blocks import WIKILINK_RE, block_id, note_book
+from .constants import BOOK_ABBR_INDEX, ONE_CHAPTER_BOOKS
+
+SPLIT_MODES = ("book", "chapter")
+
+# Chapter of a verse (8-2, 8-Title) or chapter (8) block ID, and of a footnote block ID (8-2x1a)
+_TEXT_CHAPTER_RE = re.compile(r'(\d+)(?:-(?:\d+|Title))?')
+_FOOTNOTE_CHAPTER_RE = re.compile(r'(\d+)-(?:\d+|Title)x\w+')
+_OUTLINE_ID_RE = re.compile(r'o\d+')
+# A verse block ID with its chapter (8-2, 8-Title)
+_CHAPTER_VERSE_ID_RE = re.compile(r'\d+-(?:\d+|Title)')
+# A chapter note name (Rom 8, RomN 8)
+_CHAPTER_NOTE_RE = re.compile(r'(.+) (\d+)')
+
+
+def _chapter(note: str, block: str):
+    """The chapter of a block ID of a book's Text or Footnotes note, or None."""
+    book = note_book(note)
+    if book not in BOOK_ABBR_INDEX or book in ONE_CHAPTER_BOOKS or note.endswith("O") and note != book:
+        return None
+    match = (_TEXT_CHAPTER_RE if note == book else _FOOTNOTE_CHAPTER_RE).fullmatch(block or "")
+    return match.group(1) if match else None
+
+def chapter_note(note: str, block: str) -> tuple:
+    """
+    (note, block ID) of a block of a book note once split by chapter; the block ID is
+    None for a chapter anchor, which becomes a link to the chapter note.
+    """
+    chapter = _chapter(note, block)
+    if chapter is None:
+        return note, block
+    return f"{note} {chapter}", None if block == chapter else block
+
+def unsplit_note(note: str) -> str:
+    """The book note of a chapter note (Rom 8 -> Rom, RomN 8 -> RomN); other notes are returned as they are."""
+    match = _CHAPTER_NOTE_RE.fullmatch(note)
+    return match.group(1) if match and note_book(match.group(1)) in BOOK_ABBR_INDEX else note
+
+def chapter_path(book_note_path: str, chapter: str) -> str:
+    """Text/Rom.md -> Text/Rom/Rom 8.md"""
+    folder, name = book_note_path.rsplit("/", 1)
+    note = name[:-len(".md")]
+    return f"{folder}/{note}/{note} {chapter}.md"
+
+def _rewrite_link(match, current_note: str) -> str:
+    note, anchor, text = match.groups()
+    if not anchor or not anchor.startswith("^"):
+        return match.group(0)
+    target, block = chapter_note(note or current_note, anchor[1:])
+    if note and (target, block) == (note, anchor[1:]):
+        return match.group(0)
+    # Links within the note name it, since the chapter notes do not hold all of its blocks
+    return f"[[{target}{f'#^{block}' if block else ''}{f'|{text}' if text is not None else ''}]]"
+
+def rewrite_links(content: str, note: str) -> str:
+    """Point the block links of a note at the chapter notes."""
+    return WIKILINK_RE.sub(lambda match: _rewrite_link(match, note), content)
+
+def unsplit_links(content: str) -> str:
+    """Point the links to chapter notes back at the book notes, the inverse of rewrite_links."""
+    def repl(match):
+        note, anchor, text = match.groups()
+        chapter_match = _CHAPTER_NOTE_RE.fullmatch(note)
+        if not chapter_match or note_book(chapter_match.group(1)) not in BOOK_ABBR_INDEX:
+            return match.group(0)
+        block = anchor[1:] if anchor else chapter_match.group(2)
+        return f"[[{chapter_match.group(1)}#^{block}{f'|{text}' if text is not None else ''}]]"
+    return WIKILINK_RE.sub(repl, content)
+
+
+def _paragraph_chapter(note: str, paragraph: str):
+    """The chapter of the first block ID of a paragraph that has one."""
+    for line in paragraph.split("\n"):
+        chapter = _chapter(note, block_id(line))
+        if chapter is not None:
+            return chapter
+    return None
+
+def _is_outline_point(paragraph: str) -> bool:
+    return any(_OUTLINE_ID_RE.fullmatch(block_id(line) or "") for line in paragraph.split("\n"))
+
+def split_text(content: str, note: str) -> dict:
+    """
+    {chapter or None: paragraphs} of a Text note. Paragraphs without a chapter go with
+    the verses after them, except those before the first outline point (the book
+    header, which stays in the book note) and those between a chapter's last verse and
+    the next heading or rule.
+    """
+    chapters, current, pending = {None: []}, None, []
+    for paragraph in content.split("\n\n"):
+        chapter = _paragraph_chapter(note, paragraph)
+        if chapter is None:
+            pending.append(paragraph)
+            continue
+        if chapter != current:
+            if current is None:
+                starts = (i for i, p in enumerate(pending) if _is_outline_point(p))
+            else:
+                starts = (i for i, p in enumerate(pending) if p.startswith(("#", "---")))
+            cut = next(starts, len(pending))
+            chapters[current].extend(pending[:cut])
+            pending = pending[cut:]
+            current = chapter
+        chapters.setdefault(chapter, []).extend(pending + [paragraph])
+        pending = []
+    chapters[current].extend(pending)
+    return chapters
+
+def split_footnotes(content: str, note: str) -> dict:
+    """{chapter or None: footnote paragraphs} of a Footnotes note."""
+    chapters = {None: []}
+    for paragraph in content.split("\n\n"):
+        chapters.setdefault(_paragraph_chapter(note, paragraph), []).append(paragraph)
+    return chapters
+
+def is_one_chapter(book: str, text: str) -> bool:
+    """Whether a book has one chapter: it is one of ONE_CHAPTER_BOOKS, or its Text note has no chapter-verse block ID."""
+    return book in ONE_CHAPTER_BOOKS or not any(_CHAPTER_VERSE_ID_RE.fullmatch(block_id(line) or "") for line in text.split("\n"))
+
+def _chapter_list(note: str, chapters: list) -> str:
+    return "**ch.** " + " ".join(f"[[{note} {chapter}|{chapter}]]" for chapter in chapters)
+
+def split_book(book: str, files: dict) -> dict:
+    """
+    The {relative path: content} of the rendered files of a book with its Text and
+    Footnotes notes split by chapter and the links of its notes rewritten; files of
+    other targets are kept as they are. The notes of a one-chapter book are not split,
+    only their links to other books are rewritten.
+    """
+    split_files = {}
+    one_chapter = is_one_chapter(book, files.get(f"Text/{book}.md", ""))
+    for path, content in files.items():
+        if path in (f"Text/{book}.md", f"Footnotes/{book}N.md") and one_chapter:
+            chapters = {None: [content]}
+        elif path == f"Text/{book}.md":
+            chapters = split_text(content, book)
+        elif path == f"Footnotes/{book}N.md":
+            chapters = split_footnotes(content, f"{book}N")
+            numbers = [chapter for chapter in chapters if chapter is not None]
+            chapters[None] = [_chapter_list(f"{book}N", numbers)] + chapters[None] if numbers else chapters[None]
+        elif path == f"Outlines/{book}O.md":
+            chapters = {None: [content]}
+        else:
+            split_files[path] = content
+            continue
+        note = path.rsplit("/", 1)[1][:-len(".md")]
+        for chapter, paragraphs in chapters.items():
+            chapter_content = rewrite_links("\n\n".join(paragraphs), note)
+            if content.endswith("\n") and not chapter_content.endswith("\n"):
+                chapter_content += "\n"
+            split_files[path if chapter is None else chapter_path(path, chapter)] = chapter_content
+    return split_files
+
+def book_notes(book: str, files: dict) -> dict:
+    """The Text, Footnotes and Outlines notes of a book among files (book notes and chapter notes)."""
+    notes = (f"Text/{book}", f"Footnotes/{book}N", f"Outlines/{book}O")
+    return {path: content for path, content in files.items() if path[:-len(".md")] in notes or path.rsplit("/", 1)[0] in notes}
+
+def chapter_paths(output_dir: str, book_note_path: str) -> list:
+    """The relative paths of the chapter notes of a book note in output_dir, in chapter order."""
+    folder = os.path.join(output_dir, *book_note_path[:-len(".md")].split("/"))
+    if not os.path.isdir(folder):
+        return []
+    names = [name for name in os.listdir(folder) if _CHAPTER_NOTE_RE.fullmatch(name[:-len(".md")] if name.endswith(".md") else "")]
+    names.sort(key=lambda name: int(_CHAPTER_NOTE_RE.fullmatch(name[:-len(".md")]).group(2)))
+    return [f"{book_note_path[:-len('.md')]}/{name}" for name in names]
+
+def is_split(vault_dir: str, note: str) -> bool:
+    """Whether the Text or Footnotes note of a book was split by chapter in vault_dir."""
+    book = note_book(note)
+    folder = "Text" if note == book else "Footnotes" if note == f"{book}N" else None
+    return folder is not None and os.path.isdir(os.path.join(vault_dir, folder, note))
+
+def vault_link(vault_dir: str, note: str, block: str) -> str:
+    """The Note#^block link target of a block of a book note in vault_dir, split by chapter or not."""
+    if is_split(vault_dir, note):
+        note, block = chapter_note(note, block)
+    return f"{note}#^{block}" if block else note
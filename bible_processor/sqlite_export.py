@@ -0,0 +1,138 @@
+"""
+Optional SQLite export of the converted books (stdlib sqlite3 only).
+
+Every book is written in one transaction: its verses, footnotes and outline points,
+taken from the block IDs of the generated markdown (see blocks.py). The tables are
+indexed by book, chapter and verse, so that e.g. all footnotes of Rom 8:2 are one
+index lookup:
+
+    SELECT anchor, text FROM footnotes WHERE book = 'Rom' AND chapter = 8 AND verse = '2'
+
+The books table stores a digest of each book's manifest entry, so that books skipped
+as unchanged are only exported again if the database does not have them yet.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+
+from .blocks import WIKILINK_RE, block_id, iter_paragraphs
+from .constants import ONE_CHAPTER_BOOKS
+from .manifest import pipeline_version
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (book TEXT PRIMARY KEY, digest TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS verses (
+    book TEXT NOT NULL, chapter INTEGER, verse TEXT NOT NULL, anchor TEXT NOT NULL, text TEXT NOT NULL,
+    PRIMARY KEY (book, anchor)
+);
+CREATE INDEX IF NOT EXISTS verses_by_verse ON verses (book, chapter, verse);
+CREATE TABLE IF NOT EXISTS footnotes (
+    book TEXT NOT NULL, chapter INTEGER, verse TEXT NOT NULL, note TEXT NOT NULL, anchor TEXT NOT NULL, text TEXT NOT NULL,
+    PRIMARY KEY (book, anchor)
+);
+CREATE INDEX IF NOT EXISTS footnotes_by_verse ON footnotes (book, chapter, verse);
+CREATE TABLE IF NOT EXISTS outline (
+    book TEXT NOT NULL, anchor TEXT NOT NULL, position INTEGER NOT NULL, level INTEGER NOT NULL, text TEXT NOT NULL,
+    start_chapter INTEGER, start_verse TEXT, end_chapter INTEGER, end_verse TEXT,
+    PRIMARY KEY (book, anchor)
+);
+CREATE INDEX IF NOT EXISTS outline_by_start ON outline (book, start_chapter, start_verse);
+"""
+TABLES = ["verses", "footnotes", "outline"]
+
+# Block IDs of verses (1-1, 3-16; 5 in one-chapter books, see verse_id), footnotes (1-1x1a, Titlex1) and outline points (o12)
+_VERSE_ID_RE = re.compile(r'(\d+)-(\d+|Title)')
+_ONE_CHAPTER_VERSE_ID_RE = re.compile(r'\d+|Title')
+_FOOTNOTE_ID_RE = re.compile(r'(?:(\d+)-)?(\d+|Title)x(\w+)')
+_OUTLINE_ID_RE = re.compile(r'o\d+')
+# The level and text of an outline point line
+_OUTLINE_LINE_RE = re.compile(r'(#*)\s*(.*?)\s*\^o\d+\s*$')
+
+
+def _chapter(value):
+    return int(value) if value else None
+
+def _paragraph_text(lines: list) -> str:
+    """The text of a paragraph without its trailing block ID."""
+    text = "\n".join(lines)
+    return re.sub(r'\s*\^[A-Za-z0-9-]+\s*$', '', text)
+
+def verse_id(book: str, block: str):
+    """
+    The (chapter, verse) of a verse block ID of a book, or None. The verses of
+    one-chapter books are block ^5 and stored as chapter 1; in other books a bare
+    number is the anchor of a chapter.
+    """
+    match = _VERSE_ID_RE.fullmatch(block or "")
+    if match:
+        return _chapter(match.group(1)), match.group(2)
+    if book in ONE_CHAPTER_BOOKS and _ONE_CHAPTER_VERSE_ID_RE.fullmatch(block or ""):
+        return 1, block
+    return None
+
+def verse_rows(book: str, text: str):
+    """Yield the verses rows of a Text note."""
+    for _, lines, block in iter_paragraphs(text):
+        verse = verse_id(book, block)
+        if verse:
+            yield book, *verse, block, _paragraph_text(lines)
+
+def footnote_rows(book: str, notes: str):
+    """Yield the footnotes rows of a Footnotes note. The notes of one-chapter books (^5x1) are in chapter 1, like their verses."""
+    for _, lines, block in iter_paragraphs(notes):
+        match = _FOOTNOTE_ID_RE.fullmatch(block or "")
+        if match:
+            chapter = _chapter(match.group(1))
+            if chapter is None and book in ONE_CHAPTER_BOOKS:
+                chapter = 1
+            yield book, chapter, match.group(2), match.group(3), block, _paragraph_text(lines)
+
+def outline_rows(book: str, outline: str):
+    """Yield the outline rows of an Outlines note, with the first and last verse each point links to."""
+    position = 0
+    for line in outline.split("\n"):
+        block = block_id(line)
+        if not block or not _OUTLINE_ID_RE.fullmatch(block):
+            continue
+        level, text = _OUTLINE_LINE_RE.search(line).groups()
+        verses = []
+        for note, anchor, _ in (match.groups() for match in WIKILINK_RE.finditer(line)):
+            verse = verse_id(book, (anchor or "")[1:])
+            if note == book and verse:
+                verses.append(verse)
+        start, end = (verses[0], verses[-1]) if verses else ((None, None), (None, None))
+        position += 1
+        yield book, block, position, len(level), text, *start, *end
+
+
+def entry_digest(entry: dict) -> str:
+    """Digest of a book's manifest entry, which identifies the markdown it was exported from."""
+    return hashlib.sha256(json.dumps([pipeline_version(), entry], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SqliteExport:
+    """SQLite database the converted books are written to."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def digest(self, book: str):
+        """Digest the book was last exported with, or None."""
+        row = self.connection.execute("SELECT digest FROM books WHERE book = ?", (book,)).fetchone()
+        return row[0] if row else None
+
+    def add_book(self, book: str, text: str, notes: str, outline: str, digest: str):
+        """Replace the rows of a book in one transaction."""
+        with self.connection:
+            for table in TABLES:
+                self.connection.execute(f"DELETE FROM {table} WHERE book = ?", (book,))
+            self.connection.executemany("INSERT OR REPLACE INTO verses VALUES (?, ?, ?, ?, ?)", verse_rows(book, text))
+            self.connection.executemany("INSERT OR REPLACE INTO footnotes VALUES (?, ?, ?, ?, ?, ?)", footnote_rows(book, notes))
+            self.connection.executemany("INSERT OR REPLACE INTO outline VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", outline_rows(book, outline))
+            self.connection.execute("INSERT OR REPLACE INTO books VALUES (?, ?)", (book, digest))
+
+    def close(self):
+        self.connection.close()
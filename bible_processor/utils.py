@@ -1,14 +1,89 @@
 # Utility functions for parse_text refactor
+import functools
 import re
 from bs4 import BeautifulSoup, NavigableString
 from typing import Dict, Any
 import re
+from collections import deque
+from typing import Iterable, Iterator
 from .constants import BIBLEHUB_INTERLINEAR, BOOK_ABBR, BOOK_ABBR_INDEX, BOOK_ABBR_REVERSE, JUBILEE_ABRV_TO_FULL_BOOK, JUBILEE_ABRV_TO_FULL_BOOK_REVERSE, OUTLINE_MAP
 
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the lines of "\n".join(chunks).splitlines() without building the joined text.
+
+    Line stages may emit chunks that contain line breaks themselves; this splits them
+    exactly like the next stage would have split the whole text.
+    """
+    pending = None
+    for chunk in chunks:
+        pending = chunk if pending is None else pending + "\n" + chunk
+        parts = pending.splitlines(True)
+        for part in parts[:-1]:
+            yield part.splitlines()[0]
+        pending = parts[-1] if parts else ""
+    if pending:
+        yield from pending.splitlines()
+
+class _Lookahead:
+    """Line iterator that can look at (and edit) lines that were not consumed yet."""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._buffer = deque()
+
+    def _fill(self, n: int) -> bool:
+        while len(self._buffer) < n:
+            try:
+                self._buffer.append(next(self._lines))
+            except StopIteration:
+                return False
+        return True
+
+    def has(self, k: int = 0) -> bool:
+        """True if there are more than k unconsumed lines."""
+        return self._fill(k + 1)
+
+    def __getitem__(self, k: int) -> str:
+        self._fill(k + 1)
+        return self._buffer[k]
+
+    def __setitem__(self, k: int, line: str):
+        self._fill(k + 1)
+        self._buffer[k] = line
+
+    def pop(self) -> str:
+        self._fill(1)
+        return self._buffer.popleft()
+
+def free_tree(element):
+    """
+    Break the reference cycles of a soup or tag and everything below it, so that it is
+    freed as soon as it is no longer referenced instead of at the next full garbage
+    collection. (decompose() leaves them in place.) The element is unusable afterwards;
+    freeing it again does nothing.
+    """
+    if not element.__dict__:
+        return
+    for node in list(getattr(element, "descendants", ())):
+        node.__dict__.clear()
+    element.__dict__.clear()
+
+def free_trees(elements):
+    """
+    free_tree all elements once a loop is done with them. A loop over find_all() must
+    not free a tag as soon as it is replaced: the nested tags of the same name (<b>x<b>y</b></b>,
+    as html.parser builds from unclosed tags) were found too and are still to come.
+    """
+    for element in elements:
+        free_tree(element)
+
 def replace_tags(soup, tag_name, replace_func):
     """Replace all tags of a given type in soup using replace_func."""
-    for tag in soup.find_all(tag_name):
+    tags = soup.find_all(tag_name)
+    for tag in tags:
         tag.replace_with(replace_func(tag))
+    free_trees(tags)
 
 def insert_newlines_before_br(soup):
     """Insert newlines before <br> tags in soup."""
@@ -58,38 +133,39 @@ def cleanup_markdown(text, current_book):
     text = text.replace("_ _", " ")
 
     # print lines with "|*]]"
-    for line in text.splitlines():
-      if "|*]]" in line:
-        print(f"Warning: Book {current_book} has |*]] in line: {line}")
+    if "|*]]" in text:
+      for line in text.splitlines():
+        if "|*]]" in line:
+          print(f"Warning: Book {current_book} has |*]] in line: {line}")
 
 
     return text
 
-def merge_multiline_chapter_links(text):
-    """Merge lines starting with **ch.** and all following lines containing only chapter links."""
-    lines = text.splitlines()
-    merged_lines = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
+_CHAPTER_LINKS_LINE_RE = re.compile(r'(\s*.*?\|•]].*\s*)+')
+
+def iter_merge_multiline_chapter_links(lines):
+    """Line stage of merge_multiline_chapter_links."""
+    lines = _Lookahead(lines)
+    while lines.has():
+        line = lines.pop()
         if line.startswith("**ch.**") or line.startswith("**vv.**"):
             merged = line.strip()
-            j = i + 1
-            while j < len(lines) and (
-                lines[j].strip() == "" or
-                re.fullmatch(r'(\s*.*?\|•]].*\s*)+', lines[j].strip())
+            while lines.has() and (
+                lines[0].strip() == "" or
+                _CHAPTER_LINKS_LINE_RE.fullmatch(lines[0].strip())
             ):
-                if lines[j].strip():
-                    merged += " " + lines[j].strip() + "\n"
-                j += 1
-            merged_lines.append(merged)
+                next_line = lines.pop()
+                if next_line.strip():
+                    merged += " " + next_line.strip() + "\n"
+            yield merged
             if line.startswith("**vv.**"):
-                merged_lines.append("\n---\n")
-            i = j
+                yield "\n---\n"
         else:
-            merged_lines.append(line)
-            i += 1
-    return "\n".join(merged_lines)
+            yield line
+
+def merge_multiline_chapter_links(text):
+    """Merge lines starting with **ch.** and all following lines containing only chapter links."""
+    return "\n".join(iter_merge_multiline_chapter_links(text.splitlines()))
 
 def add_chapter_anchors(text, current_book):
     """Add chapter anchors and Psalm navigation."""
@@ -150,17 +226,18 @@ def replace_bible_links(text, current_book):
 
     return text
 
+def iter_remove_unwanted_lines_and_separate_verse_outline(lines, current_book):
+    """Line stage of remove_unwanted_lines_and_separate_verse_outline."""
+    for line in lines:
+      if line.lstrip().startswith("[[#^b|Verses]]") or line.lstrip().startswith(f"[[{current_book}#^b|Verses]]"):
+        continue
+      if "**[[Bible|" in line and not line.startswith("**[[Bible|"):
+        line = line.replace("**[[Bible|", "\n\n**[[Bible|")
+      yield line
+
 def remove_unwanted_lines_and_separate_verse_outline(text, current_book):
     """Remove lines that start with **vv. or [[#^b|Verses]]."""
-    lines = [
-        line for line in text.splitlines()
-        if not (line.lstrip().startswith("[[#^b|Verses]]") or line.lstrip().startswith(f"[[{current_book}#^b|Verses]]"))
-    ]
-    for i in range(len(lines)):
-      if "**[[Bible|" in lines[i] and not lines[i].startswith("**[[Bible|"):
-        lines[i] = lines[i].replace("**[[Bible|", "\n\n**[[Bible|")
-
-    return "\n".join(lines)
+    return "\n".join(iter_remove_unwanted_lines_and_separate_verse_outline(text.splitlines(), current_book))
 
 def update_front_matter_with_subject(text, front_matter, properties):
     """Extract 'Subject of ...' lines and move to front matter."""
@@ -283,42 +360,38 @@ def map_outline_line(line: str, current_book: str, previous_rom: str = None, pre
 
     return line, previous_rom, previous_arabic
 
-def map_outline_lines(text_or_lines: str | list[str], current_book: str, previous_rom: str = None, previous_arabic: str = None, output_line_separator: str = "\n") -> str:
-    """Map outline line to markdown heading based on label, tracking previous roman and arabic labels."""
-    new_lines = []
-    if isinstance(text_or_lines, list):
-        lines = text_or_lines
-    else:
-        lines = text_or_lines.splitlines()
-
+_OUTLINE_POINT_RE = re.compile(r'(\(\[\[[^#]*#\^o[^\|]+\|[^\]]+\]\](?: [^\)]*)?\))')
 
-    for i in range(len(lines)):
-        line = lines[i].strip()
+def iter_map_outline_lines(lines, current_book: str, previous_rom: str = None, previous_arabic: str = None):
+    """Line stage of map_outline_lines."""
+    for line in lines:
+        line = line.strip()
         # If the line contains multiple outline points in parentheses, split them out
-        outline_point_pattern = r'(\(\[\[[^#]*#\^o[^\|]+\|[^\]]+\]\](?: [^\)]*)?\))'
-        outline_points = re.findall(outline_point_pattern, line)
+        outline_points = _OUTLINE_POINT_RE.findall(line)
         if outline_points and len(outline_points) >= 1:
           # Remove all found outline points from the line
           rest = line
           for op in outline_points:
             rest = rest.replace(op, '')
           # Add each outline point as its own line
-          for op in outline_points:
-            new_lines.append("\n" + op.strip())
+          split_lines = ["\n" + op.strip() for op in outline_points]
           # If anything remains, add it as a separate line
           if rest.strip():
-            new_lines.append("\n" + rest.strip())
-          continue
-        # Otherwise, process the line normally
-        new_lines.append(line)
-
-    lines = new_lines
-    new_lines = []
+            split_lines.append("\n" + rest.strip())
+        else:
+          # Otherwise, process the line normally
+          split_lines = [line]
+        for split_line in split_lines:
+            split_line, previous_rom, previous_arabic = map_outline_line(split_line, current_book, previous_rom, previous_arabic)
+            yield split_line
 
-    for i, line in enumerate(lines):
-        line, previous_rom, previous_arabic = map_outline_line(line, current_book, previous_rom, previous_arabic)
-        new_lines.append(line)
-    return output_line_separator.join(new_lines)
+def map_outline_lines(text_or_lines: str | list[str], current_book: str, previous_rom: str = None, previous_arabic: str = None, output_line_separator: str = "\n") -> str:
+    """Map outline line to markdown heading based on label, tracking previous roman and arabic labels."""
+    if isinstance(text_or_lines, list):
+        lines = text_or_lines
+    else:
+        lines = text_or_lines.splitlines()
+    return output_line_separator.join(iter_map_outline_lines(lines, current_book, previous_rom, previous_arabic))
 
 
 def adjust_newlines(text: str) -> str:
@@ -339,73 +412,153 @@ def adjust_newlines(text: str) -> str:
     return "\n".join(new_lines)
 
 
-def convert_to_obsidian_link(tag, current_book: str, all_refs: Dict[str, Any]) -> str:
-    """Convert HTML anchor tag to Obsidian link."""
+# Jubilee book abbreviations (e.g. Mat, 1Co) and the abbreviations they are rewritten to in link texts
+JUBILEE_ABBR_REWRITES = {jubilee_abbr: BOOK_ABBR.get(full_book, full_book) for jubilee_abbr, full_book in JUBILEE_ABRV_TO_FULL_BOOK.items()}
+# One alternation of all abbreviations, longest first, so that a single scan rewrites them all
+_JUBILEE_ABBR_RE = re.compile(r'\b(?:' + '|'.join(re.escape(abbr) for abbr in sorted(JUBILEE_ABBR_REWRITES, key=len, reverse=True)) + r')\b')
+_DISPLAY_PARENTHESES = str.maketrans({'[': '(', ']': ')'})
+_DISPLAY_ESCAPES = str.maketrans({'[': '\\[', ']': '\\]'})
+
+def replace_jubilee_abbreviations(text: str) -> str:
+    """Rewrite all Jubilee book abbreviations in text (e.g. Mat 5:3 -> Matt 5:3)."""
+    return _JUBILEE_ABBR_RE.sub(lambda m: JUBILEE_ABBR_REWRITES[m.group(0)], text)
+
+# Marks the position of a not yet converted link inside extracted text, see resolve_link_placeholders
+LINK_PLACEHOLDER = "\x00{}\x00"
+_LINK_PLACEHOLDER_RE = re.compile(r'\x00(\d+)\x00')
+
+def extract_link(tag) -> tuple:
+    """Return the (href, name, text) of an HTML anchor tag that convert_to_obsidian_link works on."""
     href = tag.get("href", "")
     name = tag.get("name", "")
     if tag.find('s'):
         s = tag.find('s')
         s.replace_with(f"^{s.get_text()}")
-    text = tag.get_text()
-    for jubilee_abbr, full_book in JUBILEE_ABRV_TO_FULL_BOOK.items():
-        abbr = BOOK_ABBR.get(full_book, full_book)
-        text = re.sub(rf'\b{re.escape(jubilee_abbr)}\b', abbr, text)
-    match = re.match(r'(?:([\w]+)\.htm)?(?:#([^"]+))?', href)
-    if match:
-        file, anchor = match.groups()
-        is_note, is_outline = False, False
-        if file and file.endswith("N"):
-            file = file[:-1]
-            is_note = True
-        elif file and file.endswith("O"):
-            file = file[:-1]
-            is_outline = True
-        book = ""
-        if file == "a":
-            book = "Bible"
-        elif is_outline:
-            book = BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK.get(file.strip())) + 'O'
-        elif file:
-            book = BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK.get(file.strip())) + ('N' if is_note else '')
-        chapter = None
-        if anchor and (anchor.startswith("v") or anchor.startswith("n")):
-            m = re.match(r'n(?:(\d+)_)?(\d+|Title)(?:x([^P]+)(?:P(\d+))?)', anchor)
-            if m:
-                chapter = m.group(1)
-                verse = m.group(2)
-                note = m.group(3)
-                tmp_book = BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK.get(file.strip())) if file else ""
-                if not tmp_book:
-                    tmp_book = current_book
-                if chapter:
-                    anchor = all_refs[tmp_book][f"{chapter}{(f'-{verse}x{note}' if note else f'-{verse}') if verse else ''}"]
-                else:
-                    anchor = all_refs[tmp_book][f"{(f'{verse}x{note}' if note else f'{verse}') if verse else ''}"]
-                book = tmp_book + "N"
-
-            # Match v, v3, v3_Title, etc.
-            m = re.match(r'v(\d+)(?:_(Title|\d+))?', anchor)
-            if m:
-                chapter = m.group(1)
-                verse = m.group(2)
-                anchor = f"{chapter}-{verse}" if verse else chapter
-        if not text:
-            text = "*"
-        if not book and not anchor:
-            book = f"{current_book}#{BOOK_ABBR_REVERSE.get(current_book)}"
-        res = ""
-        if anchor:
-            # replace [ and ] with \[ and \] in display part
-            text = re.sub(r'\[', r'(', text)
-            text = re.sub(r'\]', r')', text)
-            res = f"[[{book if book else current_book}#^{anchor}|{text}]]", name
-        else:
-            # replace [ and ] with \[ and \] in display part
-            text = re.sub(r'(\[|\])', r'\\\1', text)
-            res = f"[[{book}|{text}]]", name
-        return res
+        free_tree(s)
+    return href, name, tag.get_text()
 
-    return text, name
+def convert_to_obsidian_link(tag, current_book: str, all_refs: Dict[str, Any]) -> str:
+    """Convert HTML anchor tag to Obsidian link."""
+    return obsidian_link(*extract_link(tag), current_book, all_refs)
+
+def resolve_link_placeholders(text: str, links: list, current_book: str, all_refs: Dict[str, Any], targets: dict = None) -> str:
+    """
+    Replace LINK_PLACEHOLDER markers in text by the Obsidian links of the (href, name, text) entries in links.
+    With targets, the (note, block ID) every link points to (see obsidian_link) is stored in it by link index.
+    """
+    if targets is None:
+        return _LINK_PLACEHOLDER_RE.sub(lambda m: obsidian_link(*links[int(m.group(1))], current_book, all_refs)[0], text)
+
+    def resolve(m):
+        index = int(m.group(1))
+        found = []
+        link = obsidian_link(*links[index], current_book, all_refs, found)[0]
+        targets[index] = found[0]
+        return link
+    return _LINK_PLACEHOLDER_RE.sub(resolve, text)
+
+def _footnote_target(all_refs: Dict[str, Any], book: str, anchor: str, current_book: str) -> str:
+    """Resolve a footnote anchor of book through all_refs, keeping it as is if it cannot be resolved."""
+    try:
+        refs = all_refs[book]
+    except KeyError:
+        print(f"Warning: {current_book} links to footnotes of {book}, which has no footnotes file. Keeping anchor {anchor}.")
+        return anchor
+    if anchor not in refs:
+        print(f"Warning: {current_book} links to unknown footnote {book} {anchor}. Keeping the anchor as is.")
+        return anchor
+    return refs[anchor]
+
+# Most links of a book repeat (footnote references, chapter bullets, verse anchors), so
+# the parts of a conversion that do not depend on all_refs are memoized per
+# (href, text, current_book); the bound keeps the memory of long runs flat.
+LINK_CACHE_SIZE = 16384
+
+def _verse_anchor(anchor: str) -> str:
+    """Rewrite a v, v3 or v3_Title anchor to a block ID (3, 3-Title); other anchors are kept."""
+    m = re.match(r'v(\d+)(?:_(Title|\d+))?', anchor)
+    if m:
+        chapter = m.group(1)
+        verse = m.group(2)
+        anchor = f"{chapter}-{verse}" if verse else chapter
+    return anchor
+
+def _link(book: str, anchor: str, text: str) -> str:
+    """Format an Obsidian link, escaping the brackets of its display text."""
+    if anchor:
+        # replace [ and ] with ( and ) in display part
+        return f"[[{book}#^{anchor}|{text.translate(_DISPLAY_PARENTHESES)}]]"
+    # replace [ and ] with \[ and \] in display part
+    return f"[[{book}|{text.translate(_DISPLAY_ESCAPES)}]]"
+
+@functools.lru_cache(maxsize=LINK_CACHE_SIZE)
+def _link_plan(href: str, text: str, current_book: str) -> tuple:
+    """
+    The part of obsidian_link that does not depend on all_refs.
+
+    Returns (link, note, block ID, None, None) for links that need no footnote lookup,
+    and (None, note, None, footnote key, text) for links to a footnote, whose anchor is
+    looked up in all_refs by obsidian_link. The note and block ID are those the link
+    points to, None if it has none.
+    """
+    text = replace_jubilee_abbreviations(text)
+    match = re.match(r'(?:([\w]+)\.htm)?(?:#([^"]+))?', href)
+    if not match:
+        return text, None, None, None, None
+    file, anchor = match.groups()
+    is_note, is_outline = False, False
+    if file and file.endswith("N"):
+        file = file[:-1]
+        is_note = True
+    elif file and file.endswith("O"):
+        file = file[:-1]
+        is_outline = True
+    book = ""
+    if file == "a":
+        book = "Bible"
+    elif is_outline:
+        book = BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK.get(file.strip())) + 'O'
+    elif file:
+        book = BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK.get(file.strip())) + ('N' if is_note else '')
+    if not text:
+        text = "*"
+    if anchor and (anchor.startswith("v") or anchor.startswith("n")):
+        m = re.match(r'n(?:(\d+)_)?(\d+|Title)(?:x([^P]+)(?:P(\d+))?)', anchor)
+        if m:
+            chapter = m.group(1)
+            verse = m.group(2)
+            note = m.group(3)
+            tmp_book = BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK.get(file.strip())) if file else ""
+            if not tmp_book:
+                tmp_book = current_book
+            if chapter:
+                key = f"{chapter}{(f'-{verse}x{note}' if note else f'-{verse}') if verse else ''}"
+            else:
+                key = f"{(f'{verse}x{note}' if note else f'{verse}') if verse else ''}"
+            return None, tmp_book + "N", None, (tmp_book, key), text
+        anchor = _verse_anchor(anchor)
+    if not book and not anchor:
+        book = f"{current_book}#{BOOK_ABBR_REVERSE.get(current_book)}"
+    note = (book or current_book) if anchor else book
+    return _link(note, anchor, text), note, anchor or None, None, None
+
+def link_cache_info():
+    """Hits, misses and size of the link conversion cache of this process (see functools.lru_cache)."""
+    return _link_plan.cache_info()
+
+def obsidian_link(href: str, name: str, text: str, current_book: str, all_refs: Dict[str, Any], targets: list = None) -> str:
+    """
+    Convert the href, name and text of an HTML anchor tag to an Obsidian link.
+    With targets, the (note, block ID) the link points to is appended to it, None for links without either.
+    """
+    link, note, anchor, footnote, text = _link_plan(href, text, current_book)
+    if footnote is not None:
+        # Footnote anchors are resolved on every call, so that unresolved ones are reported for every link
+        anchor = _verse_anchor(_footnote_target(all_refs, *footnote, current_book))
+        link = _link(note, anchor, text)
+    if targets is not None:
+        targets.append((note, anchor))
+    return link, name
 
 def remove_obsidian_links(text: str) -> str:
     """
@@ -417,20 +570,32 @@ def remove_obsidian_links(text: str) -> str:
     text = re.sub(r'\[\[([^\]|]+)\]\]', r'\1', text)
     return text
 
-def extract_properties(soup: BeautifulSoup) -> str:
-    """Extract YAML frontmatter from HTML soup."""
+def extract_property_pairs(soup: BeautifulSoup):
+    """Remove the property table from HTML soup and return its (key, value) pairs, or None if there is none."""
     table = soup.find("table", {"align": "center"})
     if not table:
-        return ""
+        return None
     ins_tags = table.find_all("ins")
-    properties = {}
+    pairs = []
     for ins in ins_tags:
         text = ins.decode_contents().strip()
         if ':' in text:
             key_part, value_part = text.split(':', 1)
-            key = key_part.strip()
-            properties[key] = value_part.strip()
+            pairs.append((key_part.strip(), value_part.strip()))
     table.replace_with("")
+    free_tree(table)
+    return pairs
+
+def extract_properties(soup: BeautifulSoup) -> str:
+    """Extract YAML frontmatter from HTML soup."""
+    pairs = extract_property_pairs(soup)
+    if pairs is None:
+        return ""
+    return properties_front_matter(pairs)
+
+def properties_front_matter(pairs: list) -> tuple:
+    """Build the front matter and the properties (without links) from property (key, value) pairs."""
+    properties = dict(pairs)
     yaml_frontmatter = ""
     for key, value in properties.items():
         yaml_frontmatter += f'**{key}**: {value}\n\n'
@@ -440,146 +605,126 @@ def extract_properties(soup: BeautifulSoup) -> str:
         properties[key] = remove_obsidian_links(properties[key])
     return yaml_frontmatter, properties
 
+# Pattern A: chapter:verse inside the bold header
+#   **[[Bible|Book]] [[Book#Book|CH]]:[[...|VV]]**
+_VERSE_CH_VERSE_RE = re.compile(
+    r'^\*\*\[\[Bible\|[^\]]+\]\]\s+\[\[[^\]]+\|(\d+)\]\]:(?:\[\[[^\]]+\|([^\]]+)\]\])?\*\*'
+)
+# Pattern B: one-chapter books → only a single number (the verse) in the bold header, no colon
+#   **[[Bible|Book]] [[Book#Book|VV]]**
+# Accept a digit+optional letter (e.g., 14b) just in case your data uses lettered verses.
+_VERSE_ONE_CHAPTER_RE = re.compile(
+    r'^\*\*\[\[Bible\|[^\]]+\]\]\s+\[\[[^\]]+\|([^\]]+)\]\]\*\*'
+)
+
+def iter_add_verse_anchors(lines):
+    """Line stage of add_verse_anchors, looking ahead to the end of each verse paragraph."""
+    lines = _Lookahead(lines)
+    while lines.has():
+        line = lines.pop()
+        m = _VERSE_CH_VERSE_RE.match(line)
+        m2 = None if m else _VERSE_ONE_CHAPTER_RE.match(line)
+        if m or m2:
+            if m:
+                chap, verse = m.group(1), m.group(2)
+                anchor = f" ^{chap}-{verse}" if verse else f" ^{chap}"
+            else:
+                anchor = f" ^{m2.group(1)}"
+            # The anchor goes to the last line before the next empty line
+            j = 0
+            while lines.has(j) and lines[j].strip() != "":
+                j += 1
+            if j == 0:
+                line = line.rstrip() + anchor
+            else:
+                lines[j - 1] = lines[j - 1].rstrip() + anchor
+        yield line
+
 def add_verse_anchors(text: str) -> str:
     """Add verse anchors to lines with Bible references.
        - Normal books: **[[Bible|Book]] [[Book#Book|<chapter>]]:[[...|<verse>]]** → append  ^<chapter>-<verse>
        - One-chapter books: **[[Bible|Book]] [[Book#Book|<verse>]]** → append  ^<verse>
     """
-    # Pattern A: chapter:verse inside the bold header
-    #   **[[Bible|Book]] [[Book#Book|CH]]:[[...|VV]]**
-    pat_ch_verse = re.compile(
-        r'^\*\*\[\[Bible\|[^\]]+\]\]\s+\[\[[^\]]+\|(\d+)\]\]:(?:\[\[[^\]]+\|([^\]]+)\]\])?\*\*'
-    )
-
-
-    # Pattern B: one-chapter books → only a single number (the verse) in the bold header, no colon
-    #   **[[Bible|Book]] [[Book#Book|VV]]**
-    # Accept a digit+optional letter (e.g., 14b) just in case your data uses lettered verses.
-    pat_one_chapter = re.compile(
-        r'^\*\*\[\[Bible\|[^\]]+\]\]\s+\[\[[^\]]+\|([^\]]+)\]\]\*\*'
-    )
-
-    lines = text.splitlines()
-    new_lines = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
+    return "\n".join(iter_add_verse_anchors(text.splitlines()))
 
-        m = pat_ch_verse.match(line)
-        if m:
-            chap, verse = m.group(1), m.group(2)
-            j = i + 1
-            while j < len(lines) and lines[j].strip() != "":
-                j += 1
-            if j > 0:
-                if verse:  # chapter:verse
-                    lines[j - 1] = lines[j - 1].rstrip() + f" ^{chap}-{verse}"
-                else:      # rare: chapter only
-                    lines[j - 1] = lines[j - 1].rstrip() + f" ^{chap}"
-            new_lines.append(lines[i])
-            i += 1
-            continue
+_OUTLINE_HEADING_RE = re.compile(r'^(#|\*\s?\[|##|###|####|#####|######)')
 
-        m2 = pat_one_chapter.match(line)
-        if m2:
-            verse_only = m2.group(1)
-            j = i + 1
-            while j < len(lines) and lines[j].strip() != "":
-                j += 1
-            if j > 0:
-                lines[j - 1] = lines[j - 1].rstrip() + f" ^{verse_only}"
-            new_lines.append(lines[i])
-            i += 1
-            continue
-
-        # Default: passthrough
-        new_lines.append(line)
-        i += 1
-
-    return "\n".join(new_lines)
-
-def outline_with_spacing(text: str, current_book: str) -> str:
-    """Add spacing to outlines for markdown rendering."""
-    lines = text.splitlines()
-    result = []
-    n = len(lines)
+def iter_outline_with_spacing(lines, current_book: str):
+    """Line stage of outline_with_spacing."""
+    lines = _Lookahead(lines)
+    previous_line = None
     previous_rom, previous_arabic = None, None
-    for i, line in enumerate(lines):
+    while lines.has():
+        line = lines.pop()
         mapped, previous_rom, previous_arabic = map_outline_line(line, current_book, previous_rom, previous_arabic)
-        is_outline = bool(re.match(r'^(#|\*\s?\[|##|###|####|#####|######)', mapped.strip()))
+        is_outline = bool(_OUTLINE_HEADING_RE.match(mapped.strip()))
         if is_outline:
-            if i == 0 or lines[i-1].strip() != "":
-                result.append("")
-            result.append(mapped)
-            if i == n-1 or lines[i+1].strip() != "":
-                result.append("")
+            if previous_line is None or previous_line.strip() != "":
+                yield ""
+            yield mapped
+            if not lines.has() or lines[0].strip() != "":
+                yield ""
         else:
-            result.append(mapped)
-    return '\n'.join(result)
+            yield mapped
+        previous_line = line
+
+def outline_with_spacing(text: str, current_book: str) -> str:
+    """Add spacing to outlines for markdown rendering."""
+    return '\n'.join(iter_outline_with_spacing(text.splitlines(), current_book))
+
+_SPLIT_VERSE_RE = re.compile(
+    r'(\*\*\[\[Bible\|([^\]]+)\]\] \[\[([^\]]+)\|((\d+)\]\]:\[\[([^\]]+)\|(\d+)([a])\]\]|(\d+)([a])\]\])\*\*) (\[\[[^\]]+\|-\]\]) (.*)'
+)
+# Verse reference and outline point at the start of the second half of a split verse
+_SPLIT_VERSE_PREFIX_RE = re.compile(
+    r'^(?:\*\*\[\[Bible\|[^\]]+\]\] \[\[[^\]]+\|[^\]]+\]\](?::\[\[[^\]]+\|[^\]]+\]\])?\*\*\s*)?(?:\[\[[^\]]+#\^o[^\|]+\|-\]\]\s*)'
+)
+
+def iter_combine_split_verses(lines):
+    """Line stage of combine_split_verses, buffering one split verse at a time."""
+    lines = _Lookahead(lines)
+    while lines.has():
+        line = lines.pop()
+        m = _SPLIT_VERSE_RE.match(line)
+        if not m:
+            yield line
+            continue
+        verse_lines = [re.sub(r'(\[\[[^\]|]+\|)(\d+)[ab](\]\])', r'\1\2\3', line)]
+        while lines.has() and lines[0]:
+            verse_lines.append(lines.pop())
+        # Skip the empty line after the first half
+        if lines.has():
+            lines.pop()
+        outline_lines = []
+        while lines.has():
+            outline_candidate = lines[0]
+            if outline_candidate.strip() == "":
+                lines.pop()
+                continue
+            if re.search(r"\^o\w+\s*$", outline_candidate):
+              outline_lines.append(lines.pop())
+              continue
+            else:
+              break
+        first = True
+        while lines.has() and lines[0]:
+            # Remove verse reference and outline point at the start of the line
+            # Only insert [b] in the first verse line after the outline lines
+            verse_lines.append(_SPLIT_VERSE_PREFIX_RE.sub('\\[b\\] ' if first else '', lines.pop()))
+            first = False
+        yield from verse_lines
+        yield ""
+        for outline_line in outline_lines:
+            if outline_line.strip():
+                yield outline_line.strip()
+                yield ""
+        # Skip the empty line after the second half
+        if lines.has():
+            lines.pop()
 
 def combine_split_verses(text: str) -> str:
     """Combine split verses and outlines for proper formatting."""
-    lines = text.splitlines()
-    new_lines = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        m = re.match(
-            r'(\*\*\[\[Bible\|([^\]]+)\]\] \[\[([^\]]+)\|((\d+)\]\]:\[\[([^\]]+)\|(\d+)([a])\]\]|(\d+)([a])\]\])\*\*) (\[\[[^\]]+\|-\]\]) (.*)',
-            line
-        )
-        verse_lines = []
-        if m:
-            verse_lines.append(re.sub(r'(\[\[[^\]|]+\|)(\d+)[ab](\]\])', r'\1\2\3', line))
-            j = i+1
-            while j < len(lines) and lines[j]:
-                verse_lines.append(lines[j])
-                j += 1
-            outline_lines = []
-            k = j + 1
-            while k < len(lines):
-                outline_candidate = lines[k]
-                if outline_candidate.strip() == "":
-                    k += 1
-                    continue
-                if re.search(r"\^o\w+\s*$", outline_candidate):
-                  outline_lines.append(outline_candidate)
-                  k += 1
-                  continue
-                else:
-                  break
-            j = k
-            while j < len(lines) and lines[j]:
-                if j < len(lines):
-                    # Remove pattern like: **[[Bible|...]] [[...|...]]:[[...|...]]** at the start
-                    # Remove verse reference and outline point at the start of the line
-                    # Only insert [b] in the first verse line after the outline lines
-                    if j == k:
-                        new_line = re.sub(
-                            r'^(?:\*\*\[\[Bible\|[^\]]+\]\] \[\[[^\]]+\|[^\]]+\]\](?::\[\[[^\]]+\|[^\]]+\]\])?\*\*\s*)?(?:\[\[[^\]]+#\^o[^\|]+\|-\]\]\s*)',
-                            '\\[b\\] ',
-                            lines[j]
-                        )
-                    else:
-                        new_line = re.sub(
-                            r'^(?:\*\*\[\[Bible\|[^\]]+\]\] \[\[[^\]]+\|[^\]]+\]\](?::\[\[[^\]]+\|[^\]]+\]\])?\*\*\s*)?(?:\[\[[^\]]+#\^o[^\|]+\|-\]\]\s*)',
-                            '',
-                            lines[j]
-                        )
-                    verse_lines.append(new_line)
-                j += 1
-            new_lines.extend(verse_lines)
-            new_lines.append("")
-            for outline_line in outline_lines:
-                if outline_line.strip():
-                    new_lines.append(outline_line.strip())
-                    new_lines.append("")
-            i = j
-        else:
-            new_lines.append(line)
-        i += 1
-
-    return "\n".join(new_lines)
+    return "\n".join(iter_combine_split_verses(text.splitlines()))
 
 def extract_verse_spec(tag, current_book):
     """Return a human/markdown string like:
@@ -637,22 +782,17 @@ def extract_verse_spec(tag, current_book):
 
     return f'vv. {out}' if is_single_range else out
 
-def combine_nav_and_verse_lines(text, max_distance=4):
-    """
-    Flexibly combines navigation and verse lines for Song of Songs markdown formatting.
-    Finds nav and vv lines within max_distance lines, merges vv before '| [[...Next ->]]' in nav.
-    Output starts with '---\\n', ends with '\\n\\n---', and is surrounded by empty lines.
-    """
-    lines = text.splitlines()
-    result = []
-    n = len(lines)
-    i = 0
-    while i < n:
+def iter_combine_nav_and_verse_lines(lines, max_distance=4):
+    """Line stage of combine_nav_and_verse_lines, looking ahead at most max_distance + 2 lines."""
+    lines = _Lookahead(lines)
+    while lines.has():
         # Find nav line
-        if lines[i].strip().startswith("---"):
+        if lines[0].strip().startswith("---"):
             # Search for nav line within next max_distance lines
             nav_idx = None
-            for j in range(i+1, min(i+3, n)):
+            for j in range(1, 3):
+                if not lines.has(j):
+                    break
                 nav_line = lines[j].strip()
                 if "<- Previous" in nav_line or "Next ->" in nav_line:
                     nav_idx = j
@@ -660,7 +800,9 @@ def combine_nav_and_verse_lines(text, max_distance=4):
             if nav_idx is not None:
                 # Search for vv line within next max_distance lines after nav
                 vv_idx = None
-                for k in range(nav_idx+1, min(nav_idx+1+max_distance, n)):
+                for k in range(nav_idx+1, nav_idx+1+max_distance):
+                    if not lines.has(k):
+                        break
                     vv_line = lines[k].strip()
                     if "**vv.**" in vv_line:
                         vv_idx = k
@@ -677,19 +819,26 @@ def combine_nav_and_verse_lines(text, max_distance=4):
                         ).replace('  ', ' ')
                     else:
                         merged = f"{nav_line} | {vv_line}"
-                    result.append("")
-                    result.append("---")
-                    result.append(merged)
-                    result.append("")
-                    result.append("---")
-                    result.append("")
+                    yield ""
+                    yield "---"
+                    yield merged
+                    yield ""
+                    yield "---"
+                    yield ""
                     # Skip processed lines
-                    i = vv_idx + 1
+                    for _ in range(vv_idx + 1):
+                        lines.pop()
                     continue
         # If no merge, preserve the line
-        result.append(lines[i])
-        i += 1
-    return "\n".join(result)
+        yield lines.pop()
+
+def combine_nav_and_verse_lines(text, max_distance=4):
+    """
+    Flexibly combines navigation and verse lines for Song of Songs markdown formatting.
+    Finds nav and vv lines within max_distance lines, merges vv before '| [[...Next ->]]' in nav.
+    Output starts with '---\\n', ends with '\\n\\n---', and is surrounded by empty lines.
+    """
+    return "\n".join(iter_combine_nav_and_verse_lines(text.splitlines(), max_distance))
 
 def ensure_empty_line_before_dashes(text: str) -> str:
     """
@@ -0,0 +1,137 @@
+"""
+Link validator for a generated vault.
+
+One pass over the notes builds a hash index of every note's block IDs and headings
+and collects its wikilinks, which are then resolved against the index. The errors
+are written to Errors/Link Errors.md, grouped by book and error type:
+
+- Missing note: the link points to a book note that is not in the vault
+- Missing block / Missing heading: the note exists but has no such ^block or heading
+- Self reference: a footnote links to itself
+- Verse mismatch: the verse shown by the link text is not the verse it links to
+- Duplicate block: a block ID occurs more than once in a note
+
+Links to notes that are not generated (Bible, "Genesis (Book)", ...) are not checked.
+
+    python -m bible_processor.main validate [vault_folder]
+"""
+import os
+import re
+
+from .blocks import HEADING_RE, block_id, book_order, iter_links, iter_notes, iter_paragraphs, note_book, note_name, read_note
+from .constants import BOOK_ABBR_INDEX
+from .split import unsplit_note
+from .writer import OutputWriter
+
+ERRORS_DIR = "Errors"
+ERRORS_NOTE = "Link Errors.md"
+ERROR_TYPES = ["Missing note", "Missing block", "Missing heading", "Self reference", "Verse mismatch", "Duplicate block"]
+
+# Verse (^3-16, ^3-16a) and chapter (^3) anchors, and the verse or chapter:verse a link text shows
+_VERSE_ANCHOR_RE = re.compile(r'\^(\d+)(?:-(\d+)[a-z]?)?$')
+_TEXT_CHAPTER_VERSE_RE = re.compile(r'(?<![\d:])(\d+):(\d+)[a-z]?(?![\d:])')
+_TEXT_NUMBER_RE = re.compile(r'(\d+)[a-z]?')
+
+
+def index_note(path: str) -> dict:
+    """Block IDs, headings and links of one note."""
+    blocks, duplicates, headings, links = {}, [], set(), []
+    for start, lines, block in iter_paragraphs(read_note(path)):
+        for offset, line in enumerate(lines):
+            line_block = block_id(line)
+            if line_block:
+                if line_block in blocks:
+                    duplicates.append((start + offset, line_block))
+                blocks.setdefault(line_block, start + offset)
+            heading = HEADING_RE.match(line)
+            if heading:
+                headings.add(heading.group(1))
+            for note, anchor, text in iter_links(line):
+                links.append((start + offset, block, note, anchor, text))
+    return {"path": path, "blocks": blocks, "duplicates": duplicates, "headings": headings, "links": links}
+
+def _verse_mismatch(anchor: str, text: str) -> bool:
+    """True if the link text shows another chapter or verse than the one the anchor points to."""
+    target = _VERSE_ANCHOR_RE.match(anchor)
+    if not target or not text:
+        return False
+    chapter, verse = target.groups()
+    shown = _TEXT_CHAPTER_VERSE_RE.search(text)
+    if shown:
+        return verse is not None and shown.groups() != (chapter, verse)
+    shown = _TEXT_NUMBER_RE.fullmatch(text.strip())
+    if shown:
+        return shown.group(1) != (verse if verse is not None else chapter)
+    return False
+
+def check_links(notes: dict) -> list:
+    """
+    Resolve the links of all indexed notes; returns (book, type, note, line, block, link)
+    errors. The errors of chapter notes (Rom 8, RomN 8, see split.py) go with their book.
+    """
+    errors = []
+    for name, note in notes.items():
+        book_note = unsplit_note(name)
+        book = note_book(book_note)
+        for line, duplicate in note["duplicates"]:
+            errors.append((book, "Duplicate block", name, line, None, f"^{duplicate}"))
+        for line, block, target, anchor, text in note["links"]:
+            target = target or name
+            link = f"[[{target}{'#' + anchor if anchor else ''}{'|' + text if text is not None else ''}]]"
+            if target not in notes:
+                if note_book(unsplit_note(target)) in BOOK_ABBR_INDEX:
+                    errors.append((book, "Missing note", name, line, block, link))
+                continue
+            if anchor.startswith("^"):
+                if anchor[1:] not in notes[target]["blocks"]:
+                    errors.append((book, "Missing block", name, line, block, link))
+                elif target == name and anchor[1:] == block and book_note.endswith("N") and book != book_note:
+                    errors.append((book, "Self reference", name, line, block, link))
+                elif _verse_mismatch(anchor, text):
+                    errors.append((book, "Verse mismatch", name, line, block, link))
+            elif anchor and anchor not in notes[target]["headings"]:
+                errors.append((book, "Missing heading", name, line, block, link))
+    return errors
+
+def render_errors(errors: list, note_count: int, link_count: int) -> str:
+    """The Errors note: a summary and the errors grouped by book and type."""
+    out = ["# Link Errors", "", f"Checked {link_count} links in {note_count} notes: {len(errors)} errors.", ""]
+    by_book = {}
+    for book, error_type, name, line, block, link in errors:
+        by_book.setdefault(book, {}).setdefault(error_type, []).append((name, line, block, link))
+    for book in sorted(by_book, key=book_order):
+        out += [f"## {book}", ""]
+        for error_type in ERROR_TYPES:
+            entries = by_book[book].get(error_type)
+            if not entries:
+                continue
+            out += [f"### {error_type} ({len(entries)})", ""]
+            for name, line, block, link in sorted(entries, key=lambda entry: (entry[0], entry[1])):
+                where = f"[[{name}#^{block}|{name} ^{block}]]" if block else f"[[{name}]] line {line}"
+                out.append(f"- {where}: `{link}`")
+            out.append("")
+    return "\n".join(out)
+
+def validate_vault(vault_dir: str) -> list:
+    """Check all links of the vault and write the Errors note; returns the errors."""
+    errors_dir = os.path.join(vault_dir, ERRORS_DIR)
+    notes = {}
+    for path in iter_notes(vault_dir, exclude=(errors_dir,)):
+        notes[note_name(path)] = index_note(path)
+    errors = check_links(notes)
+    link_count = sum(len(note["links"]) for note in notes.values())
+    OutputWriter(vault_dir).write(os.path.join(errors_dir, ERRORS_NOTE), render_errors(errors, len(notes), link_count))
+    return errors
+
+
+def main(argv: list = None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="bible_processor.main validate", description="Check the links of a generated vault.")
+    parser.add_argument("vault_dir", nargs="?", default="Bible", help="Output directory of the conversion")
+    args = parser.parse_args(argv)
+    errors = validate_vault(args.vault_dir)
+    counts = {}
+    for error in errors:
+        counts[error[1]] = counts.get(error[1], 0) + 1
+    summary = ", ".join(f"{count} {error_type.lower()}" for error_type, count in counts.items())
+    print(f"Found {len(errors)} link errors{': ' + summary if summary else ''}. See {os.path.join(args.vault_dir, ERRORS_DIR, ERRORS_NOTE)}")
@@ -0,0 +1,86 @@
+"""
+Watch mode: keep the converter running and reconvert the books whose input files
+change.
+
+The input folder is polled with os.scandir, which needs no extra packages or
+services and only stats the ~200 input files per poll. The footnote anchors and the
+manifest stay in memory between runs (see process_all_files' state). A changed
+X.htm / XN.htm / XO.htm reconverts book X; a changed XN.htm also reconverts the
+books whose links resolved into X's footnotes in the last run.
+"""
+import os
+import time
+
+from . import inputs
+from .constants import BOOK_ABBR, JUBILEE_ABRV_TO_FULL_BOOK
+from .main import process_all_files
+
+
+def snapshot(folder_path: str) -> dict:
+    """Map the .htm files of the folder (or input archive) to their size and mtime."""
+    if inputs.is_archive(folder_path):
+        # Reopens the archive only if the archive file itself changed
+        return {name: inputs.stat(os.path.join(folder_path, name)) for name in inputs.listdir(folder_path)}
+    with os.scandir(folder_path) as entries:
+        return {
+            entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in entries
+            if entry.name.endswith(".htm") and entry.is_file()
+        }
+
+def changed_files(before: dict, after: dict) -> set:
+    """The file names added, removed or modified between two snapshots."""
+    return {name for name in before.keys() | after.keys() if before.get(name) != after.get(name)}
+
+def _file_book(name: str):
+    """The book and kind ("", "N" or "O") of an input file name, or (None, None) for other files."""
+    base = name[:-len(".htm")]
+    for kind in ("", "N", "O"):
+        jub = base[:-len(kind)] if kind else base
+        if (not kind or base.endswith(kind)) and jub in JUBILEE_ABRV_TO_FULL_BOOK:
+            return BOOK_ABBR.get(JUBILEE_ABRV_TO_FULL_BOOK[jub]), kind
+    return None, None
+
+def affected_books(changed: set, manifest: dict) -> set:
+    """The books to reconvert for the changed input files, including the dependents of changed footnotes."""
+    books, notes_changed = set(), set()
+    for name in changed:
+        book, kind = _file_book(name)
+        if book:
+            books.add(book)
+            if kind == "N":
+                notes_changed.add(book)
+    for book, entry in manifest.get("books", {}).items():
+        if notes_changed & set(entry.get("depends", {})):
+            books.add(book)
+    return books
+
+def watch(folder_path: str, output_dir: str, book_name: str = None, jobs: int = 1, force: bool = False,
+          books: list = None, interval: float = 0.5, sqlite: str = None, targets: list = ("obsidian",), split: str = "book",
+          max_memory: int = None):
+    """Convert the folder once, then reconvert affected books whenever input files change, until interrupted."""
+    selected = set(books or []) | ({book_name} if book_name else set())
+    state = {}
+    process_all_files(folder_path, output_dir, book_name, jobs, force, books=books, state=state, sqlite=sqlite, targets=targets,
+                      split=split, max_memory=max_memory)
+    before = snapshot(folder_path)
+    print(f"Watching {folder_path} for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            time.sleep(interval)
+            after = snapshot(folder_path)
+            changed = changed_files(before, after)
+            if not changed:
+                continue
+            before = after
+            affected = affected_books(changed, state["manifest"])
+            if selected:
+                affected &= selected
+            print(f"Changed: {', '.join(sorted(changed))}")
+            if affected:
+                start = time.perf_counter()
+                process_all_files(folder_path, output_dir, jobs=jobs, books=sorted(affected), state=state, sqlite=sqlite,
+                                  targets=targets, split=split, max_memory=max_memory)
+                print(f"Reconverted {', '.join(sorted(affected))} in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        print("Stopped watching.")
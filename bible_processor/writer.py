@@ -0,0 +1,74 @@
+"""
+Output layer that only touches files whose content changed.
+
+The output folder is usually a live Obsidian vault, where every rewritten file is
+reindexed and synced even if its content is identical. OutputWriter compares the
+new content with the existing file and replaces changed files atomically through a
+temporary file in the same folder. The replacement keeps the mode of the file it
+replaces, and new files get the mode open() would give them (0o666 minus the umask)
+rather than the 0o600 of the temporary file.
+"""
+import os
+import shutil
+import tempfile
+
+# The process umask, read once at import (reading it means setting it, which is not
+# thread-safe and the write-behind thread of pipeline.py writes through this module)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class OutputWriter:
+    """Writes files below output_dir, counting written and unchanged files."""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.written = 0
+        self.unchanged = 0
+        self._dirs = set()
+
+    def _makedirs(self, directory: str):
+        if directory not in self._dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._dirs.add(directory)
+
+    def write(self, path: str, content: str) -> bool:
+        """Write content to path unless the file already has that content; returns whether it was written."""
+        data = content.replace("\n", os.linesep).encode("utf-8")
+        try:
+            if os.path.getsize(path) == len(data):
+                with open(path, "rb") as f:
+                    if f.read() == data:
+                        self.unchanged += 1
+                        return False
+        except OSError:
+            pass
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        directory = os.path.dirname(path)
+        self._makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.written += 1
+        return True
+
+    def copy_if_missing(self, source: str, path: str):
+        """Copy source to path if source exists and path does not, e.g. a template the user may edit."""
+        if os.path.exists(source) and not os.path.exists(path):
+            self._makedirs(os.path.dirname(path))
+            shutil.copyfile(source, path)
+            self.written += 1
+
+    def summary(self) -> str:
+        """One-line report of the written and unchanged files."""
+        return f"Wrote {self.written} files, {self.unchanged} unchanged."
@@ -0,0 +1,14 @@
+"""Tests of the HTML extraction in parsers.py."""
+from bible_processor.parsers import extract_text, load_footnotes
+
+
+def test_footnote_with_nested_same_name_tags():
+    # html.parser nests unclosed tags: <b>x<b>y</b></b>
+    html = '<html><body><a name="n1_1x1"></a><p><b>x<b>y</b></b> and <u>u<u>v</u></u> <s>s<s>t</s></s></p></body></html>'
+    refs, notes = load_footnotes("GenN.htm", html)
+    assert refs == {"1-1x1": "1-1x1"}
+    assert notes[0].text == "**xy** and uv st"
+
+def test_text_with_nested_same_name_tags():
+    html = '<html><body><b>x<b>y</b></b> <i>a<i>b</i></i> <q>q<q>r</q></q></body></html>'
+    assert extract_text("Gen.htm", "Gen", html).text == "**xy** _ab_ \n   qr\n"
@@ -0,0 +1,31 @@
+"""Tests of the --profile report (profiling.py)."""
+import json
+import subprocess
+import sys
+
+from benchmarks.corpus import generate_corpus
+
+
+def _calls(report: dict) -> dict:
+    """
+    {book: {stage: calls}} of a profile report, without read_html: serial runs read
+    ahead in a thread, which is not timed, while pool workers read the files themselves.
+    """
+    return {
+        book: {stage: stats["calls"] for stage, stats in data["stages"].items() if stage != "parsers.read_html"}
+        for book, data in report["books"].items()
+    }
+
+def _profile(input_dir, output_dir, report_path, *args) -> dict:
+    subprocess.run([sys.executable, "-m", "bible_processor.main", str(input_dir), str(output_dir), "--force",
+                    "--profile", str(report_path), *args], check=True, capture_output=True)
+    with open(report_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_call_counts_match_between_serial_and_pool_runs(tmp_path):
+    generate_corpus(str(tmp_path / "in"), 1)
+    serial = _profile(tmp_path / "in", tmp_path / "serial", tmp_path / "serial.json")
+    for jobs in ("2", "3"):
+        pooled = _profile(tmp_path / "in", tmp_path / f"jobs{jobs}", tmp_path / f"jobs{jobs}.json", "--jobs", jobs)
+        assert _calls(pooled) == _calls(serial)
+    assert serial["books"]["Gen"]["stages"]["parsers.load_footnotes"]["calls"] == 1
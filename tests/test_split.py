@@ -0,0 +1,26 @@
+"""Tests of the --split chapter layout (split.py)."""
+import filecmp
+import subprocess
+import sys
+
+from benchmarks.corpus import generate_corpus
+
+
+def _convert(input_dir, output_dir, *args):
+    subprocess.run([sys.executable, "-m", "bible_processor.main", str(input_dir), str(output_dir), *args],
+                   check=True, capture_output=True)
+
+def _same_tree(left, right) -> bool:
+    comparison = filecmp.dircmp(left, right, ignore=[".bible_processor"])
+    def same(c):
+        if c.left_only or c.right_only or c.diff_files or c.funny_files:
+            return False
+        return all(same(sub) for sub in c.subdirs.values())
+    return same(comparison)
+
+def test_changing_layout_of_some_books_converts_every_book(tmp_path):
+    generate_corpus(str(tmp_path / "in"), 1)
+    _convert(tmp_path / "in", tmp_path / "partial")
+    _convert(tmp_path / "in", tmp_path / "partial", "--split", "chapter", "--books", "Gen")
+    _convert(tmp_path / "in", tmp_path / "full", "--split", "chapter")
+    assert _same_tree(tmp_path / "partial", tmp_path / "full")
@@ -0,0 +1,19 @@
+"""Tests of the SQLite export (sqlite_export.py)."""
+from bible_processor.sqlite_export import footnote_rows, verse_rows
+
+
+def test_footnotes_of_one_chapter_books_are_in_chapter_1():
+    for book in ("Jude", "Obad"):
+        notes = f"**3<sup>1</sup>** Note on verse 3.\n[ [[{book}N#^3x1|1]] ] ^3x1\n\n**Title<sup>1</sup>** Note on the title. ^Titlex1\n"
+        assert [row[:5] for row in footnote_rows(book, notes)] == [
+            (book, 1, "3", "1", "3x1"),
+            (book, 1, "Title", "1", "Titlex1"),
+        ]
+        assert [row[:4] for row in verse_rows(book, "Verse three. ^3\n")] == [(book, 1, "3", "3")]
+
+def test_footnotes_of_other_books_keep_their_chapter():
+    notes = "Note on Rom 8:2. ^8-2x1\n\nNote on the title. ^Titlex1\n"
+    assert [row[:5] for row in footnote_rows("Rom", notes)] == [
+        ("Rom", 8, "2", "1", "8-2x1"),
+        ("Rom", None, "Title", "1", "Titlex1"),
+    ]